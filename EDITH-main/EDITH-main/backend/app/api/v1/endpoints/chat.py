@@ -16,9 +16,9 @@ router = APIRouter()
 
 # Browser action tools that modify page state — after these, LLM should observe
 BROWSER_ACTION_TOOLS = {
-    'click', 'hover', 'fill', 'type_text', 'fill_form', 'select_option',
+    'click', 'hover', 'fill', 'type_text', 'fill_form', 'chain', 'select_option',
     'press_key', 'scroll_page', 'scroll_to_element', 'navigate_page',
-    'navigate_history', 'submit_form', 'drag', 'new_page', 'select_page'
+    'navigate_history', 'submit_form', 'drag', 'new_page', 'open_tabs', 'select_page'
 }
 # Browser observation tools — no nudge needed after these
 BROWSER_OBSERVE_TOOLS = {
@@ -112,7 +112,7 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
                 # Wrap argument parsing in safety
                 try:
                     args = json.loads(tc["function"]["arguments"])
-                except:
+                except (json.JSONDecodeError, TypeError):
                     args = {"raw": tc["function"]["arguments"]}
                     
                 assistant_parts.append({
@@ -131,7 +131,7 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
                     tc_id = tc["id"]
                     try:
                         fn_args = json.loads(tc["function"]["arguments"])
-                    except:
+                    except (json.JSONDecodeError, TypeError):
                         fn_args = {}
 
                     actions_taken.append(f"Action: {fn_name}")
@@ -195,7 +195,7 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
                                 try:
                                     ss = await mcp_service.execute_tool('take_screenshot', {})
                                     tool_result += f"\n[Debug screenshot: {ss}]"
-                                except:
+                                except Exception:
                                     pass
 
                     conversation_history.append({
@@ -231,7 +231,7 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
                 system_override=context_instruction
             )
             final_response = llm_raw["choices"][0]["message"].get("content") or "I've reached my process limit. Please check the logs for the data gathered."
-        except:
+        except Exception:
             final_response = "I ran out of reasoning steps (max iterations reached). Here is what I found so far. Check the log for details."
 
     new_log.description = f"Intent: {intent} | Plan: {len(plan_data['steps']) if plan_data else 0} | Actions: {len(actions_taken)}"
@@ -17,6 +17,11 @@ import random
 import os
 import base64
 import logging
+import functools
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urljoin
+from typing import Optional
 
 import nodriver as uc
 
@@ -26,18 +31,29 @@ logger = logging.getLogger(__name__)
 # JAVASCRIPT CONSTANTS
 # ═══════════════════════════════════════════════════════════════════════════
 
-SNAPSHOT_JS_TEMPLATE = """
-((() => {{
-    const snapshotId = {snapshot_id};
+# Snapshot scan: function(root, snapshotId, offset, limit) → {elements, more, url, title}
+# (url/title of the top page, so the snapshot header costs no extra call).
+# Installed once per document as window.__edithSnapshot (SNAPSHOT_INIT_JS), so
+# each snapshot only ships a one-line call instead of this source.
+SNAPSHOT_FN_JS = """
+function (root, snapshotId, offset, limit) {
+    const page = {url: location.href, title: document.title};
+    if (!root) return {elements: [], more: false, ...page};
     let counter = 0;
+    let more = false;
     const elements = [];
 
     // IMPORTANT: Do NOT wipe existing UIDs — keep them stable across snapshots.
     // Wiping caused stale-UID bugs: LLM uses UID from snapshot N, then
     // a re-snapshot wipes it, so fill/type_text silently fails.
     // We only assign new UIDs to elements that don't have one yet.
+    // UIDs live in a per-document registry (element ⇄ uid), not in a DOM
+    // attribute: the snapshot never mutates the page (no style invalidation,
+    // no records for the page's own MutationObservers), and actions resolve
+    // a uid with one Map lookup instead of an attribute selector (_uid_query).
+    const reg = root.__edithUids || (root.__edithUids = {byEl: new WeakMap(), byUid: new Map()});
 
-    const getAccessibleName = (el) => {{
+    const getAccessibleName = (el) => {
         return el.getAttribute('aria-label') ||
                el.getAttribute('title') ||
                el.getAttribute('placeholder') ||
@@ -45,78 +61,109 @@ SNAPSHOT_JS_TEMPLATE = """
                el.getAttribute('name') ||
                (el.labels && el.labels[0] ? el.labels[0].textContent.trim() : '') ||
                el.textContent?.trim().substring(0, 80) || '';
-    }};
+    };
 
-    const isVisible = (el) => {{
-        const style = getComputedStyle(el);
-        if (style.display === 'none' || style.visibility === 'hidden') return false;
+    // Implicit ARIA role by tag / input type (explicit role attribute wins)
+    const TAG_ROLES = {a: 'link', button: 'button', select: 'combobox', textarea: 'textbox'};
+    const INPUT_ROLES = {checkbox: 'checkbox', radio: 'radio', submit: 'button', button: 'button'};
+
+    // Zero-size rect first: it rejects display:none subtrees (and empty
+    // elements) with the layout that pass 1 computes once anyway, before any
+    // style query. checkVisibility() then answers visibility (including hidden
+    // ancestors) without building a CSSStyleDeclaration per element.
+    const isVisible = (el) => {
         const rect = el.getBoundingClientRect();
-        return rect.width > 0 && rect.height > 0;
-    }};
+        if (rect.width === 0 || rect.height === 0) return false;
+        if (el.checkVisibility) return el.checkVisibility({checkVisibilityCSS: true});
+        return getComputedStyle(el).visibility !== 'hidden';
+    };
 
-    const selectors = [
+    // One combined selector = one DOM walk. Matches come back once each,
+    // in document order, so no dedup set is needed.
+    const selector = [
         'a[href]', 'button', 'input', 'select', 'textarea',
         '[role="button"]', '[role="link"]', '[role="tab"]', '[role="menuitem"]',
         '[role="checkbox"]', '[role="radio"]', '[role="switch"]',
         '[role="slider"]', '[role="combobox"]', '[role="searchbox"]', '[role="textbox"]',
         '[contenteditable="true"]', 'summary', '[tabindex]:not([tabindex="-1"])'
-    ];
-
-    const seen = new Set();
-    selectors.forEach(sel => {{
-        try {{
-            document.querySelectorAll(sel).forEach(el => {{
-                if (seen.has(el) || !isVisible(el)) return;
-                seen.add(el);
-
-                // Keep existing UID if already assigned (stable across re-snapshots)
-                let uid = el.getAttribute('data-uid');
-                if (!uid) {{
-                    uid = snapshotId + '_' + (counter++);
-                    el.setAttribute('data-uid', uid);
-                }}
-
-                const tag = el.tagName.toLowerCase();
-                let role = el.getAttribute('role') || '';
-                if (!role) {{
-                    if (tag === 'a') role = 'link';
-                    else if (tag === 'button') role = 'button';
-                    else if (tag === 'input') {{
-                        const t = (el.getAttribute('type') || 'text').toLowerCase();
-                        if (t === 'checkbox') role = 'checkbox';
-                        else if (t === 'radio') role = 'radio';
-                        else if (t === 'submit' || t === 'button') role = 'button';
-                        else role = 'textbox';
-                    }}
-                    else if (tag === 'select') role = 'combobox';
-                    else if (tag === 'textarea') role = 'textbox';
-                    else role = 'generic';
-                }}
-
-                const info = {{
-                    uid, role, tag,
-                    name: getAccessibleName(el),
-                    type: el.getAttribute('type') || '',
-                    value: el.value || '',
-                    checked: el.checked || false,
-                    disabled: el.disabled || false,
-                    href: el.getAttribute('href') || ''
-                }};
-
-                if (tag === 'select') {{
-                    const opts = [];
-                    el.querySelectorAll('option').forEach(o => {{
-                        opts.push({{ text: o.textContent.trim(), value: o.value, selected: o.selected }});
-                    }});
-                    info.options = opts;
-                }}
-                elements.push(info);
-            }});
-        }} catch(e) {{}}
-    }});
-    return elements;
-}})())
+    ].join(',');
+
+    try {
+        // Pass 1 picks the visible elements, pass 2 describes the requested page.
+        // Stops after offset + limit visible elements (+1 to know there's more).
+        const visible = [];
+        const end = offset + limit;
+        for (const el of root.querySelectorAll(selector)) {
+            if (!isVisible(el)) continue;
+            if (visible.length === end) { more = true; break; }
+            visible.push(el);
+        }
+        visible.slice(offset).forEach(el => {
+            // Keep existing UID if already assigned (stable across re-snapshots)
+            let uid = reg.byEl.get(el);
+            if (!uid) {
+                uid = snapshotId + '_' + (counter++);
+                reg.byEl.set(el, uid);
+                reg.byUid.set(uid, new WeakRef(el));
+            }
+
+            const tag = el.tagName.toLowerCase();
+            let role = el.getAttribute('role') || '';
+            if (!role) {
+                if (tag === 'input') {
+                    const t = (el.getAttribute('type') || 'text').toLowerCase();
+                    role = INPUT_ROLES[t] || 'textbox';
+                } else {
+                    role = TAG_ROLES[tag] || 'generic';
+                }
+            }
+
+            // Strings are cut to what _format_snapshot shows, so large
+            // labels/values never cross the CDP boundary (href stays whole —
+            // click's fallback navigates to it)
+            const info = {
+                uid, role, tag,
+                name: getAccessibleName(el).slice(0, 80),
+                type: el.getAttribute('type') || '',
+                value: (el.value || '').slice(0, 30),
+                checked: el.checked || false,
+                disabled: el.disabled || false,
+                href: el.getAttribute('href') || ''
+            };
+
+            if (tag === 'select') {
+                // el.options is the select's live collection — no subtree query.
+                // Only the first 5 are shown, and fill matches options in-page.
+                info.options = Array.prototype.slice.call(el.options, 0, 5).map(o => (
+                    { text: o.textContent.trim().slice(0, 20) }
+                ));
+            }
+            elements.push(info);
+        });
+    } catch(e) {}
+    return {elements, more, ...page};
+}
+"""
+SNAPSHOT_INIT_JS = f"window.__edithSnapshot = {SNAPSHOT_FN_JS.strip()};"
+# Cheap DOM fingerprint used to skip re-snapshotting an unchanged page.
+# Installs (once per document) a counter bumped by DOM mutations and by
+# input/change/hover/focus events.
+# Returns "<document id>:<epoch>". Formatted with root.
+DOM_EPOCH_JS = """
+(() => {{
+    const root = {root};
+    if (!root) return null;
+    if (!root.__edithDom) {{
+        const state = root.__edithDom = {{id: Math.random().toString(36).slice(2), epoch: 0}};
+        const bump = () => {{ state.epoch++; }};
+        new MutationObserver(bump).observe(root, {{subtree: true, childList: true, attributes: true, characterData: true}});
+        // Value changes aren't mutations; :hover/:focus menus can appear without one
+        ['input', 'change', 'mouseover', 'focusin'].forEach(t => root.addEventListener(t, bump, true));
+    }}
+    return root.__edithDom.id + ':' + root.__edithDom.epoch;
+}})()
 """
+
 # Extracts page content structure for LLM context.
 PAGE_CONTENT_JS = """
 () => {
@@ -172,13 +219,413 @@ CURSOR_JS = """
 }
 """
 
-# JS to wait until the DOM is fully loaded
-WAIT_FOR_DOM_JS = """
-() => {
-    return document.readyState;
-}
+# Self-invoking wrapper around CURSOR_JS for Page.addScriptToEvaluateOnNewDocument.
+# Runs before <body> exists, so it defers injection to DOMContentLoaded. The
+# script also runs in same-process iframes; only the top document gets a cursor.
+CURSOR_INIT_JS = (
+    "(() => { if (window !== window.top) return; const inject = " + CURSOR_JS.strip() + ";"
+    " if (document.body) inject();"
+    " else document.addEventListener('DOMContentLoaded', inject); })()"
+)
+
+# Resolves once the document has fully loaded: at once if readyState is
+# already 'complete', else on the window's load event — no polling
+WAIT_FOR_LOAD_JS = """
+new Promise(resolve => {
+    if (document.readyState === 'complete') return resolve(true);
+    window.addEventListener('load', () => resolve(true), {once: true});
+})
+"""
+
+# Retry delay (seconds) for _wait_for_page_ready when the document can't be
+# evaluated (replaced mid-navigation, non-HTML page): starts short, grows
+# 1.5x per retry up to the max
+READY_POLL_START = 0.05
+READY_POLL_MAX = 0.5
+
+# URL, title and scroll metrics of the page in one round-trip
+PAGE_STATE_JS = """
+({
+    url: window.location.href,
+    title: document.title,
+    scrollY: Math.round(window.scrollY),
+    scrollHeight: document.documentElement.scrollHeight,
+    viewportHeight: window.innerHeight
+})
+"""
+
+# Waits in-page for text to appear. Checks once, then again only when the
+# DOM changes (MutationObserver) — at most once per 50 ms, since innerText
+# forces a layout. Resolves true/false; formatted with needle/timeout.
+WAIT_FOR_TEXT_JS = """
+new Promise(resolve => {{
+    const needle = {needle};
+    const found = () => (document.body?.innerText || '').toLowerCase().includes(needle);
+    if (found()) return resolve(true);
+    let pending = null;
+    const finish = result => {{
+        observer.disconnect();
+        clearTimeout(pending);
+        clearTimeout(capTimer);
+        resolve(result);
+    }};
+    const observer = new MutationObserver(() => {{
+        if (pending) return;
+        pending = setTimeout(() => {{
+            pending = null;
+            if (found()) finish(true);
+        }}, 50);
+    }});
+    observer.observe(document.documentElement, {{subtree: true, childList: true, characterData: true}});
+    const capTimer = setTimeout(() => finish(found()), {timeout});
+}})
 """
 
+# Resolves once the DOM has had no mutations for {quiet} ms (the page has
+# settled), or after {timeout} ms at most. Replaces fixed post-action sleeps.
+# Once the page starts unloading it stops arming the quiet timer, so a
+# pending navigation isn't mistaken for a settled page — the promise then
+# dies with the document (see _wait_for_settle).
+SETTLE_JS = """
+new Promise(resolve => {{
+    let quietTimer, capTimer, leaving = false;
+    const onLeave = () => {{
+        leaving = true;
+        clearTimeout(quietTimer);
+    }};
+    const done = () => {{
+        observer.disconnect();
+        window.removeEventListener('beforeunload', onLeave);
+        clearTimeout(quietTimer);
+        clearTimeout(capTimer);
+        resolve(true);
+    }};
+    const observer = new MutationObserver(() => {{
+        clearTimeout(quietTimer);
+        if (!leaving) quietTimer = setTimeout(done, {quiet});
+    }});
+    window.addEventListener('beforeunload', onLeave, {{once: true}});
+    observer.observe(document, {{subtree: true, childList: true, attributes: true, characterData: true}});
+    quietTimer = setTimeout(done, {quiet});
+    capTimer = setTimeout(done, {timeout});
+}})
+"""
+
+# Sets an input's value in one call via the native setter, then fires
+# input/change so React/Vue controlled inputs pick it up. Formatted with
+# target (a JS expression for the element) and value (a JSON string).
+# Rich-text editors (contenteditable) keep their own model and ignore a
+# direct write — for those it only focuses and returns {editable: true}, and
+# the caller types with key events instead. Anything else (body, select,
+# button, div…) is left untouched and returns {notEditable: true}.
+SET_VALUE_JS = """
+(() => {{
+    const el = {target};
+    if (!el) return null;
+    const doc = el.ownerDocument;
+    if (el === doc.body || el === doc.documentElement) return {{notEditable: true}};
+    // Use the element's own realm — it may live in an iframe
+    const view = doc.defaultView;
+    const proto = el.tagName === 'TEXTAREA' ? view.HTMLTextAreaElement.prototype
+                : el.tagName === 'INPUT' ? view.HTMLInputElement.prototype : null;
+    if (!proto) return el.isContentEditable ? (el.focus(), {{editable: true}}) : {{notEditable: true}};
+    el.focus();
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, {value});
+    el.dispatchEvent(new Event('input', {{bubbles: true}}));
+    el.dispatchEvent(new Event('change', {{bubbles: true}}));
+    return {{value: el.value}};
+}})()
+"""
+
+# Clears the focused field in one call: select its contents, then
+# execCommand('delete'), which edits like the user did — the page gets real
+# beforeinput/input events, so React/Vue state follows. Formatted with root.
+CLEAR_FOCUSED_JS = """
+(() => {{
+    const doc = {root};
+    const el = doc?.activeElement;
+    if (!el || el === doc.body) return false;
+    if (typeof el.select === 'function') {{
+        if (!el.value) return true;
+        el.select();
+    }} else {{
+        if (!el.textContent) return true;
+        const range = doc.createRange();
+        range.selectNodeContents(el);
+        const sel = doc.getSelection();
+        sel.removeAllRanges();
+        sel.addRange(range);
+    }}
+    doc.execCommand('delete');
+    return true;
+}})()
+"""
+
+# Submit-button candidates, probed in one querySelectorAll (document order)
+SUBMIT_SELECTORS = 'button[type="submit"], input[type="submit"], button:not([type])'
+
+# Clicks the first visible submit button in the active document, else submits
+# its first form — one evaluate for the whole probe. Visibility is checked the
+# way the snapshot does (checkVisibility), which also accepts position:fixed
+# buttons that the old offsetParent test skipped. Formatted with root.
+SUBMIT_FORM_JS = """
+(() => {{
+    const root = {root};
+    if (!root) return 'No submit button found.';
+    const isVisible = (el) => {{
+        if (el.checkVisibility ? !el.checkVisibility({{checkVisibilityCSS: true}})
+                : getComputedStyle(el).visibility === 'hidden') return false;
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    }};
+    for (const btn of root.querySelectorAll(SELECTORS)) {{
+        if (isVisible(btn)) {{
+            btn.click();
+            return 'submitted: ' + (btn.textContent?.trim() || btn.value || 'button');
+        }}
+    }}
+    // Try forms
+    const form = root.querySelector('form');
+    if (form) {{ form.submit(); return 'form submitted'; }}
+    return 'No submit button found.';
+}})()
+""".replace("SELECTORS", json.dumps(SUBMIT_SELECTORS))
+
+# Seconds per typed character in type_text (~25 chars/sec), CDP time included
+TYPING_INTERVAL = 0.04
+
+# Key name → (CDP key name, windowsVirtualKeyCode, text)
+KEY_INFO = {
+    'Enter':     ('Enter',    13,  '\r'),
+    'Return':    ('Enter',    13,  '\r'),
+    'Tab':       ('Tab',       9,  '\t'),
+    'Escape':    ('Escape',   27,  ''),
+    'Backspace': ('Backspace', 8,  '\x08'),
+    'Delete':    ('Delete',   46,  ''),
+    'ArrowUp':   ('ArrowUp',  38,  ''),
+    'ArrowDown': ('ArrowDown',40,  ''),
+    'ArrowLeft': ('ArrowLeft',37,  ''),
+    'ArrowRight':('ArrowRight',39, ''),
+    'Space':     (' ',        32,  ' '),
+    'Home':      ('Home',     36,  ''),
+    'End':       ('End',      35,  ''),
+    'PageUp':    ('PageUp',   33,  ''),
+    'PageDown':  ('PageDown', 34,  ''),
+}
+# Keys that can submit a form / navigate — wait for the page, not a fixed sleep
+NAV_KEYS = {'Enter', 'Return'}
+# Keys that only move focus or the caret — nothing to wait for
+INSTANT_KEYS = {'Tab', 'Escape', 'ArrowUp', 'ArrowDown', 'ArrowLeft', 'ArrowRight'}
+
+
+@functools.lru_cache(maxsize=64)
+def _modifier_flags(modifiers: str) -> int:
+    """CDP modifier bitmask (Alt=1, Ctrl=2, Shift=8) for a modifiers string."""
+    flags = 0
+    if modifiers:
+        mod_lower = modifiers.lower()
+        if 'control' in mod_lower or 'ctrl' in mod_lower:
+            flags |= 2
+        if 'shift' in mod_lower:
+            flags |= 8
+        if 'alt' in mod_lower:
+            flags |= 1
+    return flags
+
+
+@functools.lru_cache(maxsize=512)
+def _uid_query(uid: str, root: str = "document") -> str:
+    """
+    JS expression that finds the element with a snapshot uid under `root`
+    (a JS expression for a document; may be null) in the document's uid
+    registry (see SNAPSHOT_FN_JS). null once the element has left the DOM.
+    Escaped; cached per uid/root.
+    """
+    dot = "." if root == "document" else "?."
+    return (f"(e => e?.isConnected ? e : null)"
+            f"({root}{dot}__edithUids?.byUid.get({json.dumps(str(uid))})?.deref())")
+
+
+@functools.lru_cache(maxsize=None)
+def agent_files_dir() -> str:
+    """Absolute path of the agent_files folder (under the startup cwd), created on first use."""
+    path = os.path.join(os.getcwd(), "agent_files")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# How long (seconds) _url_title may reuse the last url/title read on the same
+# tab. Navigation events clear it sooner (see _prepare_tab).
+STATE_TTL = 0.5
+
+# Pixels from the bottom at which a scroll counts as reaching the end of the
+# page (scroll_page then waits for infinite-scroll content)
+SCROLL_END_MARGIN = 50
+
+# Elements per snapshot page — larger pages are paged with take_snapshot(offset=...)
+SNAPSHOT_LIMIT = 150
+
+# Static lines of the formatted snapshot (see _format_snapshot)
+SNAPSHOT_UID_NOTE = "NOTE: UIDs are STABLE — they do NOT change on re-snapshot. Use them directly."
+SNAPSHOT_INPUTS_HEADER = "── 🔍 TYPE INTO THESE (search/input fields) ──"
+SNAPSHOT_VIDEOS_HEADER = "── 📹 VIDEO RESULTS (click one of these to play) ──"
+SNAPSHOT_ALL_HEADER = "── ALL ELEMENTS ──"
+
+# Site-navigation hrefs flagged 🗂 in the snapshot so the LLM avoids them
+NAV_HREFS = frozenset(('/', '/feed/history', '/feed/trending', '/feed/subscriptions'))
+NAV_HREF_PREFIXES = ('/channel', '/@')
+
+# JPEG quality for screenshots — a fraction of the PNG size and plenty for
+# vision models; pass lossless=True for PNG
+SCREENSHOT_JPEG_QUALITY = 75
+
+# Chrome launch flags for the shared browser process
+BROWSER_ARGS = [
+    '--start-maximized',
+    '--disable-blink-features=AutomationControlled',
+    '--no-first-run',
+    '--no-default-browser-check',
+]
+
+# Chrome profile kept across app restarts (cookies, logins, cache), so a new
+# process starts warm instead of logging in again. BROWSER_PROFILE_DIR moves it.
+BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR") or os.path.join(os.getcwd(), "browser_profile")
+
+
+# Input types that are not text entry — left out of the snapshot's input section
+NON_TEXT_INPUT_TYPES = frozenset(('hidden', 'checkbox', 'radio', 'submit', 'button', 'file'))
+KIND_PREFIXES = {'video': "📹", 'nav': "🗂"}
+
+
+def _classify(el: dict) -> str:
+    """Snapshot section of an element: 'input', 'video', 'nav' or 'other'. Set once per scan."""
+    if el.get('role') in ('searchbox', 'textbox', 'combobox'):
+        return 'input'
+    if el.get('tag') == 'input' and el.get('type', '').lower() not in NON_TEXT_INPUT_TYPES:
+        return 'input'
+    href = el.get('href')
+    if not href:
+        return 'other'
+    if '/watch' in href:
+        return 'video'
+    if href in NAV_HREFS or href.startswith(NAV_HREF_PREFIXES):
+        return 'nav'
+    return 'other'
+
+
+def _format_element(el: dict) -> str:
+    """One line of the snapshot's ALL ELEMENTS section."""
+    parts = [f"[{el['uid']}] <{el.get('role', '?')}>"]
+    if el.get('name'):
+        parts.append(f'"{el["name"][:60]}"')
+    if el.get('type'):
+        parts.append(f"type={el['type']}")
+    if el.get('value'):
+        parts.append(f'value="{el["value"][:30]}"')
+    if el.get('checked'):
+        parts.append("✓checked")
+    if el.get('disabled'):
+        parts.append("⊘disabled")
+    if el.get('href'):
+        # Label nav links clearly so LLM avoids them
+        parts.append(f"{KIND_PREFIXES.get(el['_kind'], '')}→{el['href'][:60]}")
+    if el.get('options'):
+        parts.append(f"options=[{', '.join(o.get('text', '')[:20] for o in el['options'][:5])}]")
+    return " ".join(parts)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# STRUCTURED RESULTS
+# ═══════════════════════════════════════════════════════════════════════════
+# Returned by the read-only tools so callers get fields instead of parsing
+# text. str() renders the same message the LLM has always seen. A failed
+# call returns the same type with `error` set (and str() rendering it), so
+# callers never have to tell a result from a plain error string.
+
+@dataclass(slots=True)
+class NavResult:
+    navigated: bool = False
+    url: str = ""
+    title: str = ""
+    prev: Optional[str] = None
+    timeout: int = 0
+    error: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.error:
+            return self.error
+        if self.navigated:
+            return f"Navigation detected: {self.url} (title: {self.title})"
+        return f"No navigation detected after {self.timeout}ms."
+
+
+@dataclass(slots=True)
+class ScrollResult:
+    uid: str
+    text: str = ""
+    visible: bool = True
+    error: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.error:
+            return self.error
+        text = f" Text: '{self.text}'" if self.text else ""
+        hidden = " (element is not visible)" if not self.visible else ""
+        return f"Scrolled to [{self.uid}].{text}{hidden}"
+
+
+@dataclass(slots=True)
+class PageInfo:
+    url: str = ""
+    title: str = ""
+    tabs: int = 0
+    scroll_y: int = 0
+    scroll_height: int = 0
+    viewport_height: int = 0
+    error: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.error:
+            return self.error
+        return (
+            f"URL: {self.url}\n"
+            f"Title: {self.title}\n"
+            f"Tabs: {self.tabs}\n"
+            f"Scroll: {self.scroll_y}/{self.scroll_height} (viewport: {self.viewport_height}px)"
+        )
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SHARED BROWSER PROCESS
+# ═══════════════════════════════════════════════════════════════════════════
+
+# One Chrome process is kept warm for the lifetime of the app, so repeat
+# open_browser calls skip the multi-second cold launch. Sessions only own
+# their tabs; shutdown_browser() stops the process on app exit.
+_BROWSER = None
+
+
+async def _get_shared_browser():
+    """Returns the shared Chrome instance, launching it on first use or if it died."""
+    global _BROWSER
+    if _BROWSER is None or _BROWSER.stopped:
+        logger.info("[Browser] Launching shared Chrome via nodriver")
+        _BROWSER = await uc.start(
+            headless=False, browser_args=BROWSER_ARGS, user_data_dir=BROWSER_PROFILE_DIR
+        )
+    return _BROWSER
+
+
+def shutdown_browser():
+    """Stops the shared Chrome process. Called once on app shutdown."""
+    global _BROWSER
+    if _BROWSER is not None:
+        try:
+            _BROWSER.stop()
+        except Exception as e:
+            logger.warning(f"[Browser] Error stopping shared Chrome: {e}")
+        _BROWSER = None
+
 
 class BrowserAutomation:
     """Browser automation using nodriver CDP — async-native, no ThreadPoolExecutor."""
@@ -189,100 +636,306 @@ class BrowserAutomation:
         self.selected_page_idx = 0    # currently active page index
         self.snapshot_id = 0          # auto-incrementing for stale UID detection
         self.last_snapshot = []       # latest element list
+        self._snapshot_index = {}     # uid → element from last_snapshot
+        self._snapshot_cache = None   # (DOM fingerprint, formatted snapshot)
+        self._state_cache = None      # (target_id, monotonic time, url, title) — see _url_title
         self._dialog_message = None   # last dialog info
+        self._dialog_notes = []       # dialogs answered since the last action reported them
+        self._frame_uid = None        # uid of the iframe switched into (None = main page)
+        self._dialog_policy = None    # one-shot answer for the next dialog (set by handle_dialog)
         self._starting = False        # prevent concurrent launches
+        self._last_action_ts = 0.0    # monotonic time of the last _human_delay
+        self._prepared_targets = set()  # tab target ids already set up by _prepare_tab
+        self._pending_popups = []     # target ids of tabs opened by our pages, not yet adopted
+        self._watched_browser = None  # browser whose Target events _watch_targets handles
 
     # ═══════════════════════════════════════════════════════════════════════
     # HELPERS
     # ═══════════════════════════════════════════════════════════════════════
 
     def _get_page(self):
-        """Returns the currently selected page/tab."""
+        """Returns the currently selected page/tab (adopting any new popup first)."""
         if not self.pages:
             raise RuntimeError("No browser open. Call open_browser first.")
+        if self._pending_popups:
+            self._adopt_popups()
         if self.selected_page_idx >= len(self.pages):
             self.selected_page_idx = len(self.pages) - 1
         return self.pages[self.selected_page_idx]
 
+    def _root_js(self) -> str:
+        """JS expression for the document actions run against: the active iframe's, or the page's."""
+        if self._frame_uid is None:
+            return "document"
+        return f"{_uid_query(self._frame_uid)}?.contentDocument"
+
+    def _el(self, uid: str) -> str:
+        """JS expression for the element with `uid` in the active document (see switch_to_frame)."""
+        return _uid_query(uid, self._root_js())
+
+    def _origin_js(self) -> str:
+        """
+        JS expression for the active document's viewport origin in page
+        coordinates — added to element rects before dispatching CDP mouse events.
+        """
+        if self._frame_uid is None:
+            return "({left: 0, top: 0})"
+        return (f"(f => {{ if (!f) return {{left: 0, top: 0}}; const r = f.getBoundingClientRect();"
+                f" return {{left: r.left + f.clientLeft, top: r.top + f.clientTop}}; }})({_uid_query(self._frame_uid)})")
+
+    async def _url_title(self, page=None, fresh: bool = False) -> tuple:
+        """
+        Returns (url, title) of a page in a single evaluate round-trip.
+        Consecutive tool calls reuse the last read on the same tab for up to
+        STATE_TTL seconds; navigation clears it. Pass fresh=True to force a read.
+        """
+        page = page or self._get_page()
+        target_id = page.target.target_id
+        cached = self._state_cache
+        if (not fresh and cached and cached[0] == target_id
+                and time.monotonic() - cached[1] < STATE_TTL):
+            return cached[2], cached[3]
+        url, title = await page.evaluate("[window.location.href, document.title]")
+        self._state_cache = (target_id, time.monotonic(), url, title)
+        return url, title
+
+    async def _page_state(self, page=None) -> dict:
+        """Returns url, title and scroll metrics (PAGE_STATE_JS) in one evaluate."""
+        page = page or self._get_page()
+        state = await page.evaluate(PAGE_STATE_JS)
+        self._state_cache = (page.target.target_id, time.monotonic(), state['url'], state['title'])
+        return state
+
     async def _human_delay(self, min_ms=50, max_ms=150):
-        """Random delay to mimic human interaction timing."""
-        await asyncio.sleep(random.randint(min_ms, max_ms) / 1000.0)
+        """
+        Random delay to mimic human interaction timing. Time already spent
+        since the previous delay (the last action, its CDP round-trips) counts
+        towards it, so back-to-back actions don't stack sleeps.
+        """
+        gap = random.randint(min_ms, max_ms) / 1000.0
+        remaining = gap - (time.monotonic() - self._last_action_ts)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        self._last_action_ts = time.monotonic()
 
-    async def _inject_cursor(self):
-        """Injects visible cursor onto the page for anti-bot detection."""
+    async def _prepare_tab(self, page):
+        """
+        One-time setup per tab:
+        - Registers the visible cursor (anti-bot detection) as a new-document
+          script, so every later navigation gets it without an extra evaluate,
+          and injects it into the document already loaded.
+        - Registers the snapshot scan function the same way (take_snapshot
+          installs it itself in a document that predates this).
+        - Installs the single dialog handler (see _answer_dialog).
+        - Clears the cached url/title (see _url_title) whenever the tab navigates,
+          and the active iframe (switch_to_frame) when its top document is replaced.
+        """
         try:
-            page = self._get_page()
-            await page.evaluate(CURSOR_JS)
+            target_id = page.target.target_id
+            if target_id in self._prepared_targets:
+                return
+            self._prepared_targets.add(target_id)
+
+            async def on_dialog(event):
+                await self._answer_dialog(page, event)
+
+            def on_navigated(event):
+                self._state_cache = None
+                # A new top document takes the iframe switched into with it
+                frame = getattr(event, 'frame', None)
+                if (frame is not None and frame.parent_id is None
+                        and self.pages and self.pages[self.selected_page_idx] is page):
+                    self._frame_uid = None
+
+            page.add_handler(uc.cdp.page.JavascriptDialogOpening, on_dialog)
+            page.add_handler(uc.cdp.page.FrameNavigated, on_navigated)
+            page.add_handler(uc.cdp.page.NavigatedWithinDocument, on_navigated)
+            await page.send(uc.cdp.page.add_script_to_evaluate_on_new_document(source=CURSOR_INIT_JS))
+            await page.send(uc.cdp.page.add_script_to_evaluate_on_new_document(source=SNAPSHOT_INIT_JS))
+            await page.evaluate(CURSOR_INIT_JS)
         except Exception:
             pass
 
+    async def _watch_targets(self):
+        """
+        Subscribes (once per browser) to Target events so tabs the site opens
+        itself — target=_blank links, window.open, OAuth popups — join
+        self.pages, and closed ones leave it. Without this, actions keep
+        running on the opener while the content is in the new tab.
+        """
+        if self._watched_browser is self.browser:
+            return
+        self._watched_browser = self.browser
+
+        def on_created(event):
+            info = event.target_info
+            if info.type_ != "page" or not info.opener_id:
+                return
+            if any(p.target.target_id == info.opener_id for p in self.pages):
+                self._pending_popups.append(info.target_id)
+
+        def on_destroyed(event):
+            if event.target_id in self._pending_popups:
+                self._pending_popups.remove(event.target_id)
+            for i, p in enumerate(self.pages):
+                if p.target.target_id == event.target_id and len(self.pages) > 1:
+                    self.pages.pop(i)
+                    if self.selected_page_idx >= i:
+                        self.selected_page_idx = max(0, self.selected_page_idx - 1)
+                        self._frame_uid = None
+                    break
+
+        connection = self.browser.connection
+        connection.add_handler(uc.cdp.target.TargetCreated, on_created)
+        connection.add_handler(uc.cdp.target.TargetDestroyed, on_destroyed)
+        await connection.send(uc.cdp.target.set_discover_targets(discover=True))
+
+    def _adopt_popups(self):
+        """
+        Moves pending popups (see _watch_targets) into self.pages once nodriver
+        has a Tab for them, and selects the newest. Their one-time setup
+        (_prepare_tab) runs in the background.
+        """
+        known = {p.target.target_id for p in self.pages}
+        tabs = {t.target.target_id: t for t in self.browser.targets if t.target}
+        for target_id in list(self._pending_popups):
+            tab = tabs.get(target_id)
+            if tab is None:
+                continue
+            self._pending_popups.remove(target_id)
+            if target_id in known:
+                continue
+            self.pages.append(tab)
+            self.selected_page_idx = len(self.pages) - 1
+            self._frame_uid = None
+            asyncio.ensure_future(self._prepare_tab(tab))
+            logger.info(f"[Browser] Switched to tab [{self.selected_page_idx}] opened by the page")
+
+    async def _answer_dialog(self, page, event):
+        """
+        Answers a JavaScript dialog as soon as it opens (an open dialog blocks
+        every evaluate on the page). A policy set by handle_dialog answers the
+        next dialog only; otherwise alert/beforeunload are accepted and
+        confirm/prompt are dismissed — the safe answer to "Delete this item?".
+        The outcome is reported by the action that triggered it (_dialog_note).
+        """
+        kind = event.type_.value
+        self._dialog_message = event.message
+        policy, self._dialog_policy = self._dialog_policy, None
+        if policy:
+            accept = policy["action"] == "accept"
+        else:
+            accept = kind in ("alert", "beforeunload")
+        note = f"{kind} '{event.message[:200]}' — {'accepted' if accept else 'dismissed'}"
+        if not policy and not accept:
+            note += ". To accept it, call handle_dialog('accept') and repeat the action"
+        self._dialog_notes.append(note)
+        await page.send(uc.cdp.page.handle_java_script_dialog(
+            accept=accept,
+            prompt_text=policy["prompt"] if policy and accept else None
+        ))
+
+    def _dialog_note(self) -> str:
+        """Reports (and forgets) the dialogs answered since the last call — '' if none."""
+        if not self._dialog_notes:
+            return ""
+        notes, self._dialog_notes = self._dialog_notes, []
+        return "".join(f"\n[Dialog] {n}" for n in notes)
+
     async def _wait_for_page_ready(self, page, timeout: float = 10.0):
         """
-        Waits until document.readyState == 'complete', up to `timeout` seconds.
+        Waits until the document has loaded (readyState 'complete'), up to
+        `timeout` seconds. One awaited evaluate per document (WAIT_FOR_LOAD_JS)
+        resolves on the load event itself. If the document is replaced while
+        waiting, the evaluate fails and the wait moves on to the new one
+        (retries back off READY_POLL_START → READY_POLL_MAX).
         Falls back gracefully if unable to evaluate (e.g. non-HTML page).
         """
-        deadline = asyncio.get_event_loop().time() + timeout
-        while asyncio.get_event_loop().time() < deadline:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = READY_POLL_START
+        while (remaining := deadline - loop.time()) > 0:
             try:
-                state = await page.evaluate(WAIT_FOR_DOM_JS)
-                if state == 'complete':
+                if await asyncio.wait_for(self._cdp_eval(page, WAIT_FOR_LOAD_JS, await_promise=True), remaining):
                     return
+            except asyncio.TimeoutError:
+                break
             except Exception:
                 pass
-            await asyncio.sleep(0.3)
+            await asyncio.sleep(min(interval, max(deadline - loop.time(), 0)))
+            interval = min(interval * 1.5, READY_POLL_MAX)
         # Timed out — proceed anyway
         logger.debug("[Browser] Page readyState timeout, proceeding")
 
-    async def _move_mouse_to_element(self, uid: str):
-        """Moves mouse to the center of an element identified by uid."""
+    async def _wait_for_settle(self, page, quiet_ms: int = 300, timeout_ms: int = 1500):
+        """
+        Waits until the page stops mutating (see SETTLE_JS), capped at timeout_ms.
+        If the action navigated, the evaluate dies with the old document —
+        then wait for the new one to load instead.
+        """
         try:
-            page = self._get_page()
-            pos = await page.evaluate(f"""
-                (() => {{
-                    const el = document.querySelector('[data-uid="{uid}"]');
-                    if (!el) return null;
-                    const r = el.getBoundingClientRect();
-                    return {{x: r.x + r.width/2, y: r.y + r.height/2}};
-                }})()
-            """)
-            if pos:
-                await page.send(uc.cdp.input_.dispatch_mouse_event(
-                    type_="mouseMoved",
-                    x=pos['x'],
-                    y=pos['y']
-                ))
+            await asyncio.wait_for(
+                page.evaluate(
+                    SETTLE_JS.format(quiet=int(quiet_ms), timeout=int(timeout_ms)),
+                    await_promise=True
+                ),
+                timeout_ms / 1000.0 + 1
+            )
         except Exception:
-            pass
+            await self._wait_for_page_ready(page, timeout=timeout_ms / 1000.0)
+
+    async def _cdp_eval(self, page, expression: str, await_promise: bool = False):
+        """
+        Runs Runtime.evaluate directly with returnByValue and returns the plain
+        JSON value. Skips tab.evaluate's result post-processing — used for the
+        large snapshot payload. Raises if the script threw.
+        """
+        remote_object, errors = await page.send(uc.cdp.runtime.evaluate(
+            expression=expression,
+            return_by_value=True,
+            await_promise=await_promise
+        ))
+        if errors:
+            raise RuntimeError(errors.exception.description if errors.exception else errors.text)
+        return remote_object.value
+
+    async def _dom_fingerprint(self, page):
+        """Identifies the current DOM state of the active tab/frame (see DOM_EPOCH_JS)."""
+        try:
+            epoch = await page.evaluate(DOM_EPOCH_JS.format(root=self._root_js()))
+        except Exception:
+            return None
+        if not isinstance(epoch, str):
+            return None
+        return (page.target.target_id, self._frame_uid, epoch)
 
-    async def _format_snapshot(self, elements: list) -> str:
-        """Formats snapshot elements into a compact string for LLM consumption."""
+    def _format_snapshot(self, elements: list, page_url: str = "", offset: int = 0, more: bool = False) -> str:
+        """
+        Formats snapshot elements into a compact string for LLM consumption.
+        Pure string work — the caller fetches page_url, so this never awaits.
+        """
         if not elements:
             return "No interactive elements found on this page."
-        
-        # Get current page URL for context
-        page_url = ""
-        try:
-            page = self._get_page()
-            page_url = await page.evaluate("() => window.location.href")
-        except:
-            pass
 
-        # Cap to 150 most relevant elements to avoid token overflow
-        capped = elements[:150]
+        # The snapshot JS already capped this to SNAPSHOT_LIMIT elements
+        shown = f"#{offset + 1}–{offset + len(elements)}" if offset else f"{len(elements)}"
         lines = [
-            f"Page Snapshot (ID: {self.snapshot_id}) — {len(elements)} elements ({len(capped)} shown)",
+            f"Page Snapshot (ID: {self.snapshot_id}) — {shown} elements shown{' (more available)' if more else ''}",
             f"URL: {page_url}",
-            "NOTE: UIDs are STABLE — they do NOT change on re-snapshot. Use them directly.",
+            SNAPSHOT_UID_NOTE,
         ]
         
+        # One pass over the kinds set at scan time (see _classify)
+        search_inputs, video_links = [], []
+        for el in elements:
+            if el['_kind'] == 'input':
+                search_inputs.append(el)
+            elif el['_kind'] == 'video':
+                video_links.append(el)
+
         # ── INPUT / SEARCH FIELDS at top so LLM sees them immediately ──
-        search_inputs = [
-            el for el in capped
-            if el.get('role') in ('searchbox', 'textbox', 'combobox')
-            or (el.get('tag') == 'input' and el.get('type', '').lower() not in ('hidden', 'checkbox', 'radio', 'submit', 'button', 'file'))
-        ]
         if search_inputs:
-            lines.append("── 🔍 TYPE INTO THESE (search/input fields) ──")
+            lines.append(SNAPSHOT_INPUTS_HEADER)
             for el in search_inputs:
                 uid = el.get('uid')
                 name = el.get('name', '')[:60]
@@ -290,46 +943,19 @@ class BrowserAutomation:
                 lines.append(f"  [{uid}] <{role}> \"{name}\"")
 
         # ── VIDEO LINKS — separate section so LLM doesn't pick nav links ──
-        video_links = [
-            el for el in capped
-            if '/watch' in el.get('href', '')
-        ]
         if video_links:
-            lines.append("── 📹 VIDEO RESULTS (click one of these to play) ──")
+            lines.append(SNAPSHOT_VIDEOS_HEADER)
             for el in video_links[:15]:  # Show top 15 videos max
                 uid = el.get('uid')
                 name = el.get('name', '')[:80]
                 href = el.get('href', '')[:60]
                 lines.append(f"  [{uid}] <video-link> \"{name}\" →{href}")
 
-        lines.append("── ALL ELEMENTS ──")
-        for el in capped:
-            uid = el.get('uid')
-            if not uid:
-                continue
-            role = el.get('role', '?')
-            parts = [f"[{uid}]", f"<{role}>"]
-            if el.get('name'):
-                parts.append(f'"{el["name"][:60]}"')
-            if el.get('type'):
-                parts.append(f"type={el['type']}")
-            if el.get('value'):
-                parts.append(f'value="{el["value"][:30]}"')
-            if el.get('checked'):
-                parts.append("✓checked")
-            if el.get('disabled'):
-                parts.append("⊘disabled")
-            if el.get('href'):
-                href = el['href'][:60]
-                # Label nav links clearly so LLM avoids them
-                is_nav = el['href'] in ('/', '/feed/history', '/feed/trending', '/feed/subscriptions') or el['href'].startswith('/channel') or el['href'].startswith('/@')
-                is_video = '/watch' in el['href']
-                prefix = "📹" if is_video else ("🗂" if is_nav else "")
-                parts.append(f"{prefix}→{href}")
-            if el.get('options'):
-                opt_texts = [o.get('text', '')[:20] for o in el['options'][:5]]
-                parts.append(f"options=[{', '.join(opt_texts)}]")
-            lines.append("  " + " ".join(parts))
+        lines.append(SNAPSHOT_ALL_HEADER)
+        lines.extend([f"  {_format_element(el)}" for el in elements if el.get('uid')])
+
+        if more:
+            lines.append(f"… more elements below — call take_snapshot(offset={offset + len(elements)}) for the next batch.")
         
         return "\n".join(lines)
 
@@ -345,42 +971,35 @@ class BrowserAutomation:
                 return "Browser is already starting, please wait..."
             self._starting = True
 
-            # Close existing browser if open
+            # End the previous session (its tabs) — the Chrome process stays warm
             if self.browser:
                 try:
                     await self.close_browser()
                 except Exception:
                     pass
 
-            logger.info(f"[Browser] Launching Chrome via nodriver to {url}")
-            
-            self.browser = await uc.start(
-                headless=False,
-                browser_args=[
-                    '--start-maximized',
-                    '--disable-blink-features=AutomationControlled',
-                    '--no-first-run',
-                    '--no-default-browser-check',
-                ]
-            )
+            logger.info(f"[Browser] Opening session at {url}")
+            self.browser = await _get_shared_browser()
             
             # Get the main page
             main_page = self.browser.main_tab
             self.pages = [main_page]
             self.selected_page_idx = 0
+            self._pending_popups = []
+            await self._watch_targets()
+            await self._prepare_tab(main_page)
             
             # Navigate to URL
             await main_page.get(url)
             # 1. Wait for DOM readyState=complete
             await self._wait_for_page_ready(main_page)
-            # 2. Extra buffer: React/heavy SPAs take additional time to mount
-            logger.info("[Browser] DOM ready. Waiting 4s for JS framework to render...")
-            await asyncio.sleep(4)
+            # 2. React/heavy SPAs keep mounting after load — wait for the DOM to go quiet
+            logger.info("[Browser] DOM ready. Waiting for JS framework to render...")
+            await self._wait_for_settle(main_page, quiet_ms=500, timeout_ms=4000)
             
             self._starting = False
             
-            # Inject cursor + take initial snapshot (with built-in retry)
-            await self._inject_cursor()
+            # Take initial snapshot (with built-in retry)
             snapshot_result = await self.take_snapshot()
             
             logger.info(f"[Browser] Browser ready at {url}")
@@ -390,64 +1009,114 @@ class BrowserAutomation:
             logger.error(f"[Browser] Launch error: {e}")
             return f"Error opening browser: {str(e)}"
 
-    async def close_browser(self) -> str:
-        """Closes browser and cleans up all state."""
+    async def close_browser(self, timeout: float = 5.0) -> str:
+        """
+        Ends the browser session and cleans up all state. Idempotent.
+        Extra tabs are closed; the shared Chrome process is left running for
+        the next open_browser (see shutdown_browser). If the tabs don't close
+        within `timeout` seconds (hung page), Chrome is stopped instead so the
+        next session starts clean.
+        """
         try:
             if self.browser:
-                self.browser.stop()
-                self.browser = None
+                extra = [p for p in self.pages if p is not self.browser.main_tab]
+                if extra:
+                    try:
+                        await asyncio.wait_for(
+                            asyncio.gather(*(p.close() for p in extra), return_exceptions=True),
+                            timeout=timeout
+                        )
+                    except asyncio.TimeoutError:
+                        logger.warning("[Browser] Tabs did not close in time, stopping Chrome")
+                        shutdown_browser()
+            return "Browser closed."
+        except Exception as e:
+            return f"Error closing browser: {str(e)}"
+        finally:
+            self.browser = None
             self.pages = []
             self.selected_page_idx = 0
+            self._pending_popups = []
             self.snapshot_id = 0
             self.last_snapshot = []
+            self._snapshot_index = {}
+            self._snapshot_cache = None
+            self._state_cache = None
             self._dialog_message = None
-            return "Browser closed."
-        except Exception as e:
-            return f"Error closing browser: {str(e)}"
+            self._dialog_notes = []
+            self._dialog_policy = None
+            self._frame_uid = None
 
     # ═══════════════════════════════════════════════════════════════════════
     # CORE: SNAPSHOTS
     # ═══════════════════════════════════════════════════════════════════════
 
-    async def take_snapshot(self, max_retries: int = 3, retry_delay: float = 2.0) -> str:
+    async def take_snapshot(self, max_retries: int = 3, retry_delay: float = 2.0, offset: int = 0) -> str:
         """
-        Takes a snapshot of all interactive elements with UIDs.
+        Takes a snapshot of the interactive elements with UIDs, at most
+        SNAPSHOT_LIMIT per call; offset pages through the rest.
         Retries up to max_retries times if the page has 0 elements
-        (handles React/SPA pages that take time to mount components).
+        (handles React/SPA pages that take time to mount components),
+        waiting at most retry_delay seconds for the page in between.
+        If the DOM hasn't changed since the last snapshot, returns it as is.
         """
         try:
             page = self._get_page()
+            offset = max(int(offset or 0), 0)
+            fingerprint = await self._dom_fingerprint(page)
+            if fingerprint:
+                fingerprint += (offset,)
+            if fingerprint and self._snapshot_cache and self._snapshot_cache[0] == fingerprint:
+                logger.info("[Snapshot] DOM unchanged, reusing last snapshot")
+                return self._snapshot_cache[1]
+
             self.snapshot_id += 1
 
             for attempt in range(max_retries):
-                # Embed snapshot_id directly into JS (nodriver doesn't support arg passing)
-                snapshot_js = SNAPSHOT_JS_TEMPLATE.format(snapshot_id=self.snapshot_id)
-                elements = await page.evaluate(snapshot_js)
-                elements = elements or []
+                # Embed the arguments in the call (nodriver doesn't support arg passing)
+                args = f"{self._root_js()}, {self.snapshot_id}, {offset}, {SNAPSHOT_LIMIT}"
+                result = await self._cdp_eval(page, f"window.__edithSnapshot?.({args})")
+                if result is None:
+                    # Document loaded before the init script was registered — install it now
+                    result = await self._cdp_eval(page, f"{SNAPSHOT_INIT_JS}\nwindow.__edithSnapshot({args})")
+                result = result or {}
+                page_url = result.get('url', '')
+                if page_url:
+                    self._state_cache = (page.target.target_id, time.monotonic(), page_url, result.get('title', ''))
+                elements = result.get('elements') or []
+                for el in elements:
+                    el['_kind'] = _classify(el)
+                more = bool(result.get('more'))
                 count = len(elements)
                 logger.info(f"[Snapshot] Attempt {attempt+1}/{max_retries}: {count} elements found")
 
-                if count > 0:
+                if count > 0 or offset:
                     break
 
                 if attempt < max_retries - 1:
-                    logger.info(f"[Snapshot] Page empty, waiting {retry_delay}s for content to load...")
-                    await asyncio.sleep(retry_delay)
+                    # Wait for what the page is actually doing instead of a fixed
+                    # delay: finish loading, then mount until the DOM goes quiet.
+                    # A loaded, static empty page returns after ~200 ms.
+                    logger.info(f"[Snapshot] Page empty, waiting up to {retry_delay}s for content to load...")
+                    await self._wait_for_page_ready(page, timeout=retry_delay)
+                    await self._wait_for_settle(page, quiet_ms=200, timeout_ms=int(retry_delay * 1000))
 
             self.last_snapshot = elements
+            if not offset:
+                self._snapshot_index = {}
+            self._snapshot_index.update((el['uid'], el) for el in elements if el.get('uid'))
 
+            if not elements and offset:
+                return f"No more elements after #{offset}."
             if not elements:
-                url = ""
-                try:
-                    url = await page.evaluate("() => window.location.href")
-                except:
-                    pass
                 return (
-                    f"[Snapshot] Page appears empty or still loading (url: {url}). "
+                    f"[Snapshot] Page appears empty or still loading (url: {page_url}). "
                     "Wait 2 seconds and call take_snapshot again."
                 )
 
-            return await self._format_snapshot(self.last_snapshot)
+            formatted = self._format_snapshot(self.last_snapshot, page_url, offset, more)
+            self._snapshot_cache = (fingerprint, formatted) if fingerprint else None
+            return formatted
         except Exception as e:
             logger.error(f"[Snapshot] Error: {e}")
             return f"Error taking snapshot: {str(e)}"
@@ -456,11 +1125,12 @@ class BrowserAutomation:
     # INTERACTION: CLICK, HOVER, FILL, TYPE
     # ═══════════════════════════════════════════════════════════════════════
 
-    async def click(self, uid: str, dbl_click: bool = False) -> str:
+    async def click(self, uid: str, dbl_click: bool = False, snapshot: bool = True) -> str:
         """
         Clicks an element by its uid using real CDP mouse events.
         FALLBACK: If element is not found (React SPA re-rendered it), navigates
-        directly to the element's href from last_snapshot (works for all links/videos).
+        directly to the element's href from last_snapshot (works for all links/videos)
+        and returns a new snapshot unless snapshot=False.
         """
         try:
             page = self._get_page()
@@ -469,13 +1139,14 @@ class BrowserAutomation:
             # Get element info + position via JS
             info = await page.evaluate(f"""
                 (() => {{
-                    const el = document.querySelector('[data-uid="{uid}"]');
+                    const el = {self._el(uid)};
                     if (!el) return null;
                     el.scrollIntoView({{behavior: 'instant', block: 'center'}});
+                    const o = {self._origin_js()};
                     const r = el.getBoundingClientRect();
                     return {{
-                        x: r.left + r.width/2,
-                        y: r.top + r.height/2,
+                        x: o.left + r.left + r.width/2,
+                        y: o.top + r.top + r.height/2,
                         tag: el.tagName.toLowerCase(),
                         label: el.getAttribute('aria-label') || el.textContent?.trim().substring(0, 60) || '',
                         href: el.getAttribute('href') || ''
@@ -487,23 +1158,24 @@ class BrowserAutomation:
                 # Element disappeared — React SPA probably re-rendered it.
                 # Fall back: look it up in last_snapshot and navigate to its href.
                 logger.warning(f"[Click] UID '{uid}' not in DOM (React re-render?). Checking last_snapshot...")
-                fallback_el = next(
-                    (el for el in (self.last_snapshot or []) if el.get('uid') == uid),
-                    None
-                )
+                fallback_el = self._snapshot_index.get(uid)
                 if fallback_el and fallback_el.get('href'):
                     href = fallback_el['href']
-                    # Make absolute URL
-                    if href.startswith('/'):
-                        current_origin = await page.evaluate("() => window.location.origin")
-                        href = current_origin + href
+                    # Make absolute URL (relative to the current page). The
+                    # tab's target info is kept current by Target events, so
+                    # the base needs no evaluate.
+                    if '://' not in href:
+                        current_url = page.target.url or (await self._url_title(page))[0]
+                        href = urljoin(current_url, href)
                     name = fallback_el.get('name', href[:50])
                     logger.info(f"[Click] Fallback: navigating to href={href}")
                     await page.get(href)
                     await self._wait_for_page_ready(page)
-                    await asyncio.sleep(3)  # wait for SPA to render
-                    snapshot = await self.take_snapshot()
-                    return f"Navigated to '{name}' ({href}). {snapshot}"
+                    await self._wait_for_settle(page, quiet_ms=500, timeout_ms=3000)  # wait for SPA to render
+                    result = f"Navigated to '{name}' ({href}).{self._dialog_note()}"
+                    if not snapshot:
+                        return result
+                    return f"{result} {await self.take_snapshot()}"
                 else:
                     raise RuntimeError(
                         f"Element UID '{uid}' not found in DOM and has no href fallback. "
@@ -528,41 +1200,50 @@ class BrowserAutomation:
                 ))
                 await asyncio.sleep(0.05)
 
-            await asyncio.sleep(1.5)  # Wait for page reaction / SPA navigation
+            await self._wait_for_settle(page)  # Wait for page reaction / SPA navigation
 
             label = info.get('label', '')
             href = info.get('href', '')
             return (
                 f"Clicked [{uid}] ({info['tag']}: '{label[:50]}'{' → ' + href[:40] if href else ''}). "
                 "Page may have changed — call take_snapshot() to see current state."
+                f"{self._dialog_note()}"
             )
         except Exception as e:
             return f"Error clicking {uid}: {str(e)}"
 
-    async def hover(self, uid: str) -> str:
-        """Hovers over an element by uid. Auto-takes new snapshot."""
+    async def hover(self, uid: str, snapshot: bool = True) -> str:
+        """Hovers over an element by uid. Auto-takes new snapshot unless snapshot=False."""
         try:
             page = self._get_page()
             await self._human_delay()
-            await self._move_mouse_to_element(uid)
-            
-            result = await page.evaluate(f"""
+
+            # Scroll, synthetic hover events and the element position in one
+            # evaluate; the real mouse move then lands on the scrolled position
+            pos = await page.evaluate(f"""
                 (() => {{
-                    const el = document.querySelector('[data-uid="{uid}"]');
-                    if (!el) return 'Element not found: {uid}';
-                    el.scrollIntoView({{behavior: 'smooth', block: 'center'}});
+                    const el = {self._el(uid)};
+                    if (!el) return null;
+                    el.scrollIntoView({{behavior: 'instant', block: 'center'}});
                     el.dispatchEvent(new MouseEvent('mouseenter', {{bubbles: true}}));
                     el.dispatchEvent(new MouseEvent('mouseover', {{bubbles: true}}));
-                    return 'hovered';
+                    const o = {self._origin_js()};
+                    const r = el.getBoundingClientRect();
+                    return {{x: o.left + r.x + r.width/2, y: o.top + r.y + r.height/2}};
                 }})()
             """)
             
-            if result != 'hovered':
-                return result
-            
-            await asyncio.sleep(0.5)
-            snapshot = await self.take_snapshot()
-            return f"Hovered [{uid}]. {snapshot}"
+            if not pos:
+                return f"Element not found: {uid}"
+
+            await page.send(uc.cdp.input_.dispatch_mouse_event(
+                type_="mouseMoved", x=pos['x'], y=pos['y']
+            ))
+            # Dropdowns/menus render on hover — return once the DOM is quiet
+            await self._wait_for_settle(page, quiet_ms=150, timeout_ms=1200)
+            if not snapshot:
+                return f"Hovered [{uid}]."
+            return f"Hovered [{uid}]. {await self.take_snapshot()}"
         except Exception as e:
             return f"Error hovering {uid}: {str(e)}"
 
@@ -577,65 +1258,71 @@ class BrowserAutomation:
             page = self._get_page()
             await self._human_delay()
 
-            # Check if it's a select element — handle via pure JS
-            tag_check = await page.evaluate(f"""
+            # One lookup does it all: a <select> is set right here (direct JS
+            # value setting works fine, no React event issue); anything else is
+            # scrolled into view and its position handed on to type_text
+            probe = await page.evaluate(f"""
                 (() => {{
-                    const el = document.querySelector('[data-uid="{uid}"]');
-                    if (!el) return 'not_found';
-                    return el.tagName.toLowerCase();
+                    const el = {self._el(uid)};
+                    if (!el) return null;
+                    const tag = el.tagName.toLowerCase();
+                    if (tag === 'select') {{
+                        const val = {json.dumps(value.lower())};
+                        let found = false;
+                        for (const o of el.options) {{
+                            if (o.textContent.trim().toLowerCase().includes(val)) {{
+                                el.value = o.value; found = true; break;
+                            }}
+                        }}
+                        if (!found) el.value = {json.dumps(value)};
+                        el.dispatchEvent(new Event('change', {{bubbles: true}}));
+                        return {{tag, result: found ? 'select_done' : 'select_fallback'}};
+                    }}
+                    el.scrollIntoView({{behavior: 'instant', block: 'center'}});
+                    const o = {self._origin_js()};
+                    const r = el.getBoundingClientRect();
+                    return {{tag, x: o.left + r.left + r.width/2, y: o.top + r.top + r.height/2}};
                 }})()
             """)
 
-            if tag_check == 'not_found':
+            if not probe:
                 raise RuntimeError(
                     f"Element UID '{uid}' not found in DOM. "
                     "Call take_snapshot() to get fresh UIDs for the current page."
                 )
 
-            if tag_check == 'select':
-                # Dropdowns: direct JS value setting works fine (no React event issue)
-                result = await page.evaluate(f"""
-                    (() => {{
-                        const el = document.querySelector('[data-uid="{uid}"]');
-                        const opts = el.querySelectorAll('option');
-                        const val = '{value.lower().replace("'", "\\'")}';
-                        let found = false;
-                        for (const o of opts) {{
-                            if (o.textContent.trim().toLowerCase().includes(val)) {{
-                                el.value = o.value; found = true; break;
-                            }}
-                        }}
-                        if (!found) el.value = '{value.replace("'", "\\'")}';
-                        el.dispatchEvent(new Event('change', {{bubbles: true}}));
-                        return found ? 'select_done' : 'select_fallback';
-                    }})()
-                """)
-                return f"Selected '{value}' in [{uid}] ({result})"
+            if probe['tag'] == 'select':
+                return f"Selected '{value}' in [{uid}] ({probe['result']})"
 
             # For all text inputs — delegate to type_text (uses per-char CDP key events)
-            return await self.type_text(value, uid)
+            return await self.type_text(value, uid, pos=probe)
 
         except Exception as e:
             return f"Error filling {uid}: {str(e)}"
 
     async def fill_form(self, elements: list) -> str:
-        """Fills multiple form fields at once."""
+        """Fills multiple form fields at once (each fill paces itself via _human_delay)."""
         results = []
         for el in elements:
             uid = el.get("uid")
             value = el.get("value", "")
             r = await self.fill(uid, value)
             results.append(r)
-            await self._human_delay(100, 300)
         return "\n".join(results)
 
     async def select_option(self, uid: str, option_text: str) -> str:
         """Selects an option from a dropdown by uid and option text."""
         return await self.fill(uid, option_text)
 
-    async def type_text(self, text: str, uid: str = None) -> str:
+    async def type_text(self, text: str, uid: str = None, human: bool = True, pos: dict = None) -> str:
         """
         Types text character-by-character using CDP dispatchKeyEvent.
+        With human=False the value is set in a single evaluate (native value
+        setter + input/change events) — for fields that don't need
+        human-like typing, e.g. internal forms, file paths or JSON.
+        Contenteditable targets still get key events (see SET_VALUE_JS).
+        pos: the element's already-scrolled centre {x, y} when the caller
+        has just located it (fill does) — skips a second lookup.
         
         WHY NOT insertText/send_keys:
           page.send_keys() → Input.insertText → sets DOM value directly BUT bypasses
@@ -650,15 +1337,34 @@ class BrowserAutomation:
         try:
             page = self._get_page()
 
+            if not human:
+                target = self._el(uid) if uid else f"({self._root_js()})?.activeElement"
+                res = await page.evaluate(SET_VALUE_JS.format(target=target, value=json.dumps(text)))
+                if not res:
+                    raise RuntimeError(
+                        f"Element UID '{uid}' not found in DOM. "
+                        "Call take_snapshot() to get fresh UIDs."
+                        if uid else "No element is focused."
+                    )
+                if res.get('notEditable'):
+                    raise RuntimeError(
+                        f"Element [{uid}] is not a text field." if uid
+                        else "No text field is focused — pass the uid of the field to type into."
+                    )
+                if not res.get('editable'):
+                    return f"Typed '{text}'{' into [' + uid + ']' if uid else ' into active element'} (input now contains: '{res['value'][:40]}')"
+                logger.info("[type_text] Contenteditable target — typing with key events")
+
             if uid:
-                # 1. First find the element position
-                pos = await page.evaluate(f"""
+                # 1. First find the element position (unless the caller already has)
+                pos = pos or await page.evaluate(f"""
                     (() => {{
-                        const el = document.querySelector('[data-uid="{uid}"]');
+                        const el = {self._el(uid)};
                         if (!el) return null;
                         el.scrollIntoView({{behavior: 'instant', block: 'center'}});
+                        const o = {self._origin_js()};
                         const r = el.getBoundingClientRect();
-                        return {{x: r.left + r.width/2, y: r.top + r.height/2}};
+                        return {{x: o.left + r.left + r.width/2, y: o.top + r.top + r.height/2}};
                     }})()
                 """)
                 if not pos:
@@ -681,29 +1387,18 @@ class BrowserAutomation:
                 ))
                 await asyncio.sleep(0.3)  # Let React process the focus event
 
-                # 3. Select all existing text and delete it (Ctrl+A, Delete)
-                await page.send(uc.cdp.input_.dispatch_key_event(
-                    type_="keyDown", key="a",
-                    windows_virtual_key_code=65, modifiers=2  # Ctrl
-                ))
-                await asyncio.sleep(0.05)
-                await page.send(uc.cdp.input_.dispatch_key_event(
-                    type_="keyUp", key="a",
-                    windows_virtual_key_code=65, modifiers=2
-                ))
-                await asyncio.sleep(0.05)
-                await page.send(uc.cdp.input_.dispatch_key_event(
-                    type_="keyDown", key="Delete", windows_virtual_key_code=46
-                ))
-                await asyncio.sleep(0.05)
-                await page.send(uc.cdp.input_.dispatch_key_event(
-                    type_="keyUp", key="Delete", windows_virtual_key_code=46
-                ))
-                await asyncio.sleep(0.1)
+                # 3. Clear any existing text in one evaluate (select + delete,
+                #    see CLEAR_FOCUSED_JS) instead of Ctrl+A / Delete key events
+                await page.evaluate(CLEAR_FOCUSED_JS.format(root=self._root_js()))
 
             # 4. Type each character with keyDown + char + keyUp
             #    This is the ONLY method that triggers React's onChange for every char.
+            #    The three events stay strictly ordered (awaited one by one); their
+            #    round-trips count towards the per-character cadence instead of
+            #    adding to it.
+            loop = asyncio.get_running_loop()
             for char in text:
+                char_start = loop.time()
                 vk = ord(char) if len(char) == 1 else 0
 
                 # keyDown
@@ -730,7 +1425,10 @@ class BrowserAutomation:
                     unmodified_text=char,
                     windows_virtual_key_code=vk,
                 ))
-                await asyncio.sleep(0.04)  # ~25 chars/sec — natural typing speed
+                # ~25 chars/sec — natural typing speed
+                remaining = TYPING_INTERVAL - (loop.time() - char_start)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
 
             await asyncio.sleep(0.2)  # Let final React state update settle
 
@@ -739,11 +1437,11 @@ class BrowserAutomation:
             if uid:
                 val = await page.evaluate(f"""
                     (() => {{
-                        const el = document.querySelector('[data-uid="{uid}"]');
+                        const el = {self._el(uid)};
                         return el ? (el.value || el.textContent || '') : '';
                     }})()
                 """)
-                verify_result = f" (input now contains: '{val[:40]}')"
+                verify_result = f" (input now contains: '{(val or '')[:40]}')"
 
             return f"Typed '{text}'{' into [' + uid + ']' if uid else ' into active element'}{verify_result}"
         except Exception as e:
@@ -754,43 +1452,18 @@ class BrowserAutomation:
         """Presses a keyboard key or combination using real CDP key events."""
         try:
             page = self._get_page()
-            await self._human_delay(30, 80)
-
-            # Key name → (CDP key name, windowsVirtualKeyCode, text)
-            key_info = {
-                'Enter':     ('Enter',    13,  '\r'),
-                'Return':    ('Enter',    13,  '\r'),
-                'Tab':       ('Tab',       9,  '\t'),
-                'Escape':    ('Escape',   27,  ''),
-                'Backspace': ('Backspace', 8,  '\x08'),
-                'Delete':    ('Delete',   46,  ''),
-                'ArrowUp':   ('ArrowUp',  38,  ''),
-                'ArrowDown': ('ArrowDown',40,  ''),
-                'ArrowLeft': ('ArrowLeft',37,  ''),
-                'ArrowRight':('ArrowRight',39, ''),
-                'Space':     (' ',        32,  ' '),
-                'Home':      ('Home',     36,  ''),
-                'End':       ('End',      35,  ''),
-                'PageUp':    ('PageUp',   33,  ''),
-                'PageDown':  ('PageDown', 34,  ''),
-            }
+            instant = key in INSTANT_KEYS and not modifiers
+            if not instant:
+                await self._human_delay(30, 80)
 
-            if key in key_info:
-                cdp_key, vk_code, text = key_info[key]
+            if key in KEY_INFO:
+                cdp_key, vk_code, text = KEY_INFO[key]
             elif len(key) == 1:
                 cdp_key, vk_code, text = key, ord(key), key
             else:
                 cdp_key, vk_code, text = key, 0, ''
 
-            modifier_flags = 0
-            if modifiers:
-                mod_lower = modifiers.lower()
-                if 'control' in mod_lower or 'ctrl' in mod_lower:
-                    modifier_flags |= 2
-                if 'shift' in mod_lower:
-                    modifier_flags |= 8
-                if 'alt' in mod_lower:
-                    modifier_flags |= 1
+            modifier_flags = _modifier_flags(modifiers or '')
 
             await page.send(uc.cdp.input_.dispatch_key_event(
                 type_="keyDown",
@@ -815,8 +1488,15 @@ class BrowserAutomation:
                 modifiers=modifier_flags if modifier_flags else None
             ))
 
-            await asyncio.sleep(1.0)  # Wait for form submission / navigation
-            return f"Pressed key: {key}" + (f" + {modifiers}" if modifiers else "")
+            if key in NAV_KEYS:
+                # Form submission / navigation: give it a moment to start,
+                # then return as soon as the document is ready again
+                await asyncio.sleep(0.3)
+                await self._wait_for_page_ready(page, timeout=5.0)
+            elif not instant:
+                # Shortcuts/menus react in-page — return once the DOM is quiet
+                await self._wait_for_settle(page, quiet_ms=150, timeout_ms=1000)
+            return f"Pressed key: {key}" + (f" + {modifiers}" if modifiers else "") + self._dialog_note()
         except Exception as e:
             return f"Error pressing key {key}: {str(e)}"
 
@@ -826,14 +1506,11 @@ class BrowserAutomation:
             page = self._get_page()
             result = await page.evaluate(f"""
                 (() => {{
-                    const from_el = document.querySelector('[data-uid="{from_uid}"]');
-                    const to_el = document.querySelector('[data-uid="{to_uid}"]');
+                    const from_el = {self._el(from_uid)};
+                    const to_el = {self._el(to_uid)};
                     if (!from_el) return 'Source element not found: {from_uid}';
                     if (!to_el) return 'Target element not found: {to_uid}';
                     
-                    const fromRect = from_el.getBoundingClientRect();
-                    const toRect = to_el.getBoundingClientRect();
-                    
                     const dataTransfer = new DataTransfer();
                     from_el.dispatchEvent(new DragEvent('dragstart', {{bubbles: true, dataTransfer}}));
                     to_el.dispatchEvent(new DragEvent('dragover', {{bubbles: true, dataTransfer}}));
@@ -853,32 +1530,34 @@ class BrowserAutomation:
         try:
             # Resolve path
             if not os.path.isabs(file_path):
-                file_path = os.path.join(os.getcwd(), "agent_files", file_path)
+                file_path = os.path.join(agent_files_dir(), file_path)
             
             if not os.path.exists(file_path):
                 return f"File not found: {file_path}"
             
             page = self._get_page()
-            # Get the node for the file input
-            node = await page.evaluate(f"""
-                (() => {{
-                    const el = document.querySelector('[data-uid="{uid}"]');
-                    if (!el || el.tagName.toLowerCase() !== 'input' || el.type !== 'file') 
-                        return null;
-                    return true;
-                }})()
-            """)
-            
-            if not node:
+            # One evaluate finds and checks the input and returns it as a remote
+            # object handle (not by value) — CDP can set files on it directly
+            remote_object, errors = await page.send(uc.cdp.runtime.evaluate(
+                expression=f"""
+                    (() => {{
+                        const el = {self._el(uid)};
+                        if (!el || el.tagName.toLowerCase() !== 'input' || el.type !== 'file')
+                            return null;
+                        return el;
+                    }})()
+                """,
+                return_by_value=False
+            ))
+            if errors or not remote_object.object_id:
                 return f"Element [{uid}] is not a file input."
+
+            await page.send(uc.cdp.dom.set_file_input_files(
+                files=[os.path.abspath(file_path)], object_id=remote_object.object_id
+            ))
+            await page.send(uc.cdp.runtime.release_object(remote_object.object_id))
             
-            # Use CDP to set files on the input
-            # Find the remote object for the element
-            js_result = await page.evaluate(f"""
-                document.querySelector('[data-uid="{uid}"]')
-            """)
-            
-            return f"File upload initiated for [{uid}] with {file_path}"
+            return f"Uploaded {os.path.basename(file_path)} to [{uid}]."
         except Exception as e:
             return f"Error uploading file: {str(e)}"
 
@@ -890,9 +1569,10 @@ class BrowserAutomation:
         """Navigates the current page to a URL. Auto-takes snapshot."""
         try:
             page = self._get_page()
+            self._frame_uid = None
             await page.get(url)
-            await asyncio.sleep(2)
-            await self._inject_cursor()
+            await self._wait_for_page_ready(page, timeout=5)
+            await self._wait_for_settle(page, quiet_ms=300, timeout_ms=2000)
             snapshot = await self.take_snapshot()
             return f"Navigated to {url}\n{snapshot}"
         except Exception as e:
@@ -902,11 +1582,13 @@ class BrowserAutomation:
         """Navigates back or forward in browser history."""
         try:
             page = self._get_page()
+            self._frame_uid = None
             if direction == 'back':
                 await page.evaluate("window.history.back()")
             else:
                 await page.evaluate("window.history.forward()")
-            await asyncio.sleep(1.5)
+            # Settles on the new document (or the SPA route) as soon as it's quiet
+            await self._wait_for_settle(page, quiet_ms=300, timeout_ms=1500)
             snapshot = await self.take_snapshot()
             return f"Navigated {direction}.\n{snapshot}"
         except Exception as e:
@@ -923,13 +1605,54 @@ class BrowserAutomation:
             new_tab = await self.browser.get(url, new_tab=True)
             self.pages.append(new_tab)
             self.selected_page_idx = len(self.pages) - 1
-            await asyncio.sleep(2)
-            await self._inject_cursor()
+            self._frame_uid = None
+            await self._prepare_tab(new_tab)
+            await self._wait_for_page_ready(new_tab, timeout=5)
+            await self._wait_for_settle(new_tab, quiet_ms=300, timeout_ms=2000)
             snapshot = await self.take_snapshot()
             return f"Opened new tab: {url}\n{snapshot}"
         except Exception as e:
             return f"Error opening new tab: {str(e)}"
 
+    async def open_tabs(self, urls: list) -> str:
+        """
+        Opens several URLs in new tabs concurrently (at most 3 loading at once
+        so the browser isn't overloaded). The last tab opened becomes active.
+        A URL that fails doesn't cost the others — every tab that did open
+        joins the session, and the failures are reported.
+        """
+        try:
+            self._get_page()
+            sem = asyncio.Semaphore(3)
+
+            async def _open(url):
+                async with sem:
+                    tab = await self.browser.get(url, new_tab=True)
+                    # The tab exists now — a slow or broken page still joins self.pages
+                    try:
+                        await self._prepare_tab(tab)
+                        await self._wait_for_page_ready(tab)
+                    except Exception as e:
+                        logger.warning(f"[Browser] Tab {url} not ready: {e}")
+                    return tab
+
+            results = await asyncio.gather(*(_open(url) for url in urls), return_exceptions=True)
+            tabs = [r for r in results if not isinstance(r, BaseException)]
+            failed = [f"{url} ({r})" for url, r in zip(urls, results) if isinstance(r, BaseException)]
+            if failed and not tabs:
+                return f"Error opening tabs: {'; '.join(failed)}"
+            self.pages.extend(tabs)
+            self.selected_page_idx = len(self.pages) - 1
+            self._frame_uid = None
+            opened = [url for url, r in zip(urls, results) if not isinstance(r, BaseException)]
+            summary = f"Opened {len(tabs)} tabs: {', '.join(opened)}"
+            if failed:
+                summary += f"\nFailed to open: {'; '.join(failed)}"
+            snapshot = await self.take_snapshot()
+            return f"{summary}\n{snapshot}"
+        except Exception as e:
+            return f"Error opening tabs: {str(e)}"
+
     async def list_pages(self) -> str:
         """Lists all open pages/tabs."""
         try:
@@ -937,8 +1660,12 @@ class BrowserAutomation:
             for i, page in enumerate(self.pages):
                 marker = " ← active" if i == self.selected_page_idx else ""
                 try:
-                    title = await page.evaluate("document.title")
-                    url = await page.evaluate("window.location.href")
+                    if marker:
+                        url, title = await self._url_title(page)
+                    else:
+                        # Background tabs: use the target info nodriver keeps
+                        # updated from Target events — no CDP round-trip
+                        url, title = page.target.url, page.target.title
                 except Exception:
                     title = "Unknown"
                     url = "Unknown"
@@ -952,6 +1679,8 @@ class BrowserAutomation:
         try:
             if page_idx < 0 or page_idx >= len(self.pages):
                 return f"Invalid page index: {page_idx}. Have {len(self.pages)} pages."
+            if page_idx != self.selected_page_idx:
+                self._frame_uid = None
             self.selected_page_idx = page_idx
             page = self.pages[page_idx]
             await page.activate()
@@ -971,6 +1700,11 @@ class BrowserAutomation:
             page = self.pages.pop(page_idx)
             await page.close()
             
+            if page_idx == self.selected_page_idx:
+                self._frame_uid = None
+            elif page_idx < self.selected_page_idx:
+                # Keep the same tab active — its index shifted down
+                self.selected_page_idx -= 1
             if self.selected_page_idx >= len(self.pages):
                 self.selected_page_idx = len(self.pages) - 1
             
@@ -997,75 +1731,137 @@ class BrowserAutomation:
                 'bottom': 'window.scrollTo(0, document.body.scrollHeight)'
             }
             js = scroll_map.get(direction, scroll_map['down'])
-            await page.evaluate(js)
-            await asyncio.sleep(0.5)
+            # Scroll and wait two animation frames in the same evaluate so the
+            # page has painted before the snapshot — no fixed sleep needed.
+            # Resolves with the page state, so the position costs no extra call.
+            # Hidden documents (background tab, minimized window) never run
+            # rAF, so a timer resolves it too, and the call itself is capped.
+            try:
+                state = await asyncio.wait_for(page.evaluate(
+                    f"new Promise(r => {{ {js}; const done = () => r({PAGE_STATE_JS.strip()});"
+                    f" requestAnimationFrame(() => requestAnimationFrame(done)); setTimeout(done, 300); }})",
+                    await_promise=True
+                ), timeout=3.0)
+            except asyncio.TimeoutError:
+                state = await self._page_state(page)
+            if state and direction in ('down', 'bottom') and (
+                    state['scrollY'] + state['viewportHeight'] >= state['scrollHeight'] - SCROLL_END_MARGIN):
+                # Reached the end — infinite-scroll pages append the next batch
+                # now. Wait for the DOM to go quiet (returns fast on static pages)
+                await self._wait_for_settle(page, quiet_ms=150, timeout_ms=1500)
+                state = await self._page_state(page)
+            position = ""
+            if state:
+                position = f" (scroll {state['scrollY']}/{state['scrollHeight']}, viewport {state['viewportHeight']}px)"
             snapshot = await self.take_snapshot()
-            return f"Scrolled {direction}.\n{snapshot}"
+            return f"Scrolled {direction}.{position}\n{snapshot}"
         except Exception as e:
             return f"Error scrolling: {str(e)}"
 
-    async def scroll_to_element(self, uid: str) -> str:
-        """Scrolls until a specific element is visible."""
+    async def scroll_to_element(self, uid: str, include_text: bool = False) -> ScrollResult:
+        """
+        Scrolls until a specific element is visible.
+        Scroll, settle and the visibility check run in one evaluate: the
+        promise resolves on 'scrollend' (or after 600ms if nothing scrolled).
+        include_text=True also returns the element's text (first 80 chars) —
+        off by default since it forces layout.
+        """
         try:
             page = self._get_page()
+            text_js = "(el.innerText || '').trim().substring(0, 80)" if include_text else "''"
             result = await page.evaluate(f"""
-                (() => {{
-                    const el = document.querySelector('[data-uid="{uid}"]');
-                    if (!el) return 'Element not found: {uid}';
+                new Promise(resolve => {{
+                    const el = {self._el(uid)};
+                    if (!el) return resolve(null);
+                    const view = el.ownerDocument.defaultView;
+                    const done = () => {{
+                        const r = el.getBoundingClientRect();
+                        resolve({{
+                            visible: r.width > 0 && r.bottom > 0 && r.top < view.innerHeight,
+                            text: {text_js}
+                        }});
+                    }};
+                    el.ownerDocument.addEventListener('scrollend', done, {{once: true, capture: true}});
+                    setTimeout(done, 600);
                     el.scrollIntoView({{behavior: 'smooth', block: 'center'}});
-                    return 'scrolled';
-                }})()
-            """)
+                }})
+            """, await_promise=True)
             
-            if result != 'scrolled':
-                return result
+            if not result:
+                return ScrollResult(uid=uid, visible=False, error=f"Element not found: {uid}")
             
-            await asyncio.sleep(0.5)
-            return f"Scrolled to [{uid}]."
+            return ScrollResult(uid=uid, text=result.get('text') or "", visible=bool(result.get('visible')))
         except Exception as e:
-            return f"Error scrolling to element: {str(e)}"
+            return ScrollResult(uid=uid, visible=False, error=f"Error scrolling to element: {str(e)}")
 
     # ═══════════════════════════════════════════════════════════════════════
     # SCREENSHOTS
     # ═══════════════════════════════════════════════════════════════════════
 
-    async def take_screenshot(self, uid: str = None, full_page: bool = False) -> str:
-        """Takes a screenshot of the page or a specific element."""
+    async def capture_screenshot(self, uid: str = None, full_page: bool = False,
+                                 lossless: bool = False) -> bytes:
+        """
+        Captures the viewport, the whole scrollable page (full_page) or the
+        element with `uid`, and returns the image bytes in memory — nothing is
+        written to disk. JPEG (SCREENSHOT_JPEG_QUALITY) unless lossless=True,
+        then PNG.
+        """
+        page = self._get_page()
+        clip = None
+        beyond = full_page and not uid
+        if beyond:
+            # Content size straight from Page.getLayoutMetrics — one CDP call
+            content = (await page.send(uc.cdp.page.get_layout_metrics()))[-1]  # cssContentSize
+            clip = uc.cdp.page.Viewport(x=0, y=0, width=content.width, height=content.height, scale=1)
+        elif uid:
+            # Screenshot specific element. One evaluate brings it into view
+            # (unless it already is) and measures it; an element larger than
+            # the viewport is captured beyond it instead of cut off.
+            rect = await page.evaluate(f"""
+                (() => {{
+                    const el = {self._el(uid)};
+                    if (!el) return null;
+                    const view = el.ownerDocument.defaultView;
+                    let r = el.getBoundingClientRect();
+                    if (r.top < 0 || r.left < 0 || r.bottom > view.innerHeight || r.right > view.innerWidth) {{
+                        el.scrollIntoView({{behavior: 'instant', block: 'nearest', inline: 'nearest'}});
+                        r = el.getBoundingClientRect();
+                    }}
+                    const o = {self._origin_js()};
+                    // Clips are in page coordinates — add the scroll offset
+                    return {{x: o.left + r.x + window.scrollX, y: o.top + r.y + window.scrollY,
+                             width: r.width, height: r.height,
+                             beyond: r.height > window.innerHeight || r.width > window.innerWidth}};
+                }})()
+            """)
+            if rect:
+                clip = uc.cdp.page.Viewport(
+                    x=rect['x'], y=rect['y'],
+                    width=rect['width'], height=rect['height'],
+                    scale=1
+                )
+                beyond = bool(rect.get('beyond'))
+        data = await page.send(uc.cdp.page.capture_screenshot(
+            format_="png" if lossless else "jpeg",
+            quality=None if lossless else SCREENSHOT_JPEG_QUALITY,
+            clip=clip,
+            capture_beyond_viewport=beyond or None
+        ))
+        return base64.b64decode(data)
+
+    async def take_screenshot(self, uid: str = None, full_page: bool = False, lossless: bool = False) -> str:
+        """
+        Takes a screenshot of the page or a specific element and saves it to
+        agent_files — as .jpg, or .png when lossless=True.
+        """
         try:
-            page = self._get_page()
-            os.makedirs("agent_files", exist_ok=True)
-            
-            filename = f"screenshot_{int(time.time())}.png"
-            filepath = os.path.join("agent_files", filename)
-            
-            # Use CDP screenshot
-            if uid:
-                # Screenshot specific element
-                clip = await page.evaluate(f"""
-                    (() => {{
-                        const el = document.querySelector('[data-uid="{uid}"]');
-                        if (!el) return null;
-                        const r = el.getBoundingClientRect();
-                        return {{x: r.x, y: r.y, width: r.width, height: r.height, scale: 1}};
-                    }})()
-                """)
-                if clip:
-                    data = await page.send(uc.cdp.page.capture_screenshot(
-                        format_="png",
-                        clip=uc.cdp.page.Viewport(
-                            x=clip['x'], y=clip['y'],
-                            width=clip['width'], height=clip['height'],
-                            scale=1
-                        )
-                    ))
-                else:
-                    data = await page.send(uc.cdp.page.capture_screenshot(format_="png"))
-            else:
-                data = await page.send(uc.cdp.page.capture_screenshot(format_="png"))
-            
-            # Save screenshot
-            with open(filepath, 'wb') as f:
-                f.write(base64.b64decode(data))
+            image = await self.capture_screenshot(uid, full_page, lossless)
+
+            # Millisecond timestamp — shots taken within one second don't overwrite each other
+            filename = f"screenshot_{time.time_ns() // 1_000_000}.{'png' if lossless else 'jpg'}"
+            filepath = os.path.join(agent_files_dir(), filename)
+            # Write off the event loop — the other browser calls keep running
+            await asyncio.to_thread(Path(filepath).write_bytes, image)
             
             return f"Screenshot saved: {filename}"
         except Exception as e:
@@ -1084,11 +1880,9 @@ class BrowserAutomation:
                     const body = document.body;
                     if (!body) return 'No body element found.';
                     
-                    // Remove script/style elements from consideration
-                    const clone = body.cloneNode(true);
-                    clone.querySelectorAll('script, style, noscript').forEach(el => el.remove());
-                    
-                    let text = clone.innerText || clone.textContent || '';
+                    // innerText of the live body already skips script/style/noscript
+                    // and hidden elements — no need to clone the whole DOM first
+                    let text = body.innerText || '';
                     // Clean up excessive whitespace
                     text = text.replace(/\\n{3,}/g, '\\n\\n').trim();
                     return text.substring(0, 5000);
@@ -1131,32 +1925,39 @@ class BrowserAutomation:
                         result.headings = headings;
                     }
                     
+                    // Links and lists are capped — stop scanning once the cap is hit
+                    // instead of reading every node's text and slicing afterwards
                     if (type === 'auto' || type === 'links') {
                         const links = [];
-                        document.querySelectorAll('a[href]').forEach(a => {
+                        for (const a of document.querySelectorAll('a[href]')) {
+                            // a.href is already resolved to an absolute URL
+                            const href = a.href;
+                            if (!href || href.startsWith('javascript:') || a.getAttribute('href') === '#') continue;
                             const text = a.textContent.trim();
-                            if (text) links.push({text: text.substring(0, 100), href: a.href});
-                        });
-                        result.links = links.slice(0, 50);
+                            if (text) links.push({text: text.substring(0, 100), href});
+                            if (links.length === 50) break;
+                        }
+                        result.links = links;
                     }
                     
                     if (type === 'auto' || type === 'lists') {
                         const lists = [];
-                        document.querySelectorAll('ul, ol').forEach(list => {
-                            const items = [];
-                            list.querySelectorAll(':scope > li').forEach(li => {
-                                items.push(li.textContent.trim().substring(0, 200));
-                            });
+                        for (const list of document.querySelectorAll('ul, ol')) {
+                            const items = Array.from(list.children)
+                                .filter(li => li.tagName === 'LI')
+                                .map(li => li.textContent.trim().substring(0, 200));
                             if (items.length) lists.push(items);
-                        });
-                        result.lists = lists.slice(0, 10);
+                            if (lists.length === 10) break;
+                        }
+                        result.lists = lists;
                     }
                     
                     return JSON.stringify(result);
                 }
             """
             
-            result = await page.evaluate(js, data_type)
+            # nodriver can't pass arguments — invoke the function inline
+            result = await page.evaluate(f"({js})({json.dumps(data_type)})")
             return result or "{}"
         except Exception as e:
             return f"Error extracting structured data: {str(e)}"
@@ -1166,39 +1967,69 @@ class BrowserAutomation:
     # ═══════════════════════════════════════════════════════════════════════
 
     async def wait_for(self, text: str, timeout: int = 5000) -> str:
-        """Waits for specified text to appear on the page."""
+        """
+        Waits for specified text to appear on the page. If the page navigates
+        meanwhile (form submit, redirect), the evaluate dies with the old
+        document — the wait then carries on in the new one until the deadline.
+        """
         try:
             page = self._get_page()
-            start = time.time()
-            timeout_secs = timeout / 1000.0
-            
-            while time.time() - start < timeout_secs:
-                body_text = await page.evaluate("document.body?.innerText || ''")
-                if text.lower() in body_text.lower():
+            needle = json.dumps(text.lower())
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout / 1000.0
+            while (remaining := deadline - loop.time()) > 0:
+                # Single evaluate: the page watches its own DOM and resolves once
+                js = WAIT_FOR_TEXT_JS.format(needle=needle, timeout=int(remaining * 1000))
+                try:
+                    found = await asyncio.wait_for(page.evaluate(js, await_promise=True), remaining + 1)
+                except asyncio.TimeoutError:
+                    break
+                except Exception as e:
+                    logger.debug(f"[wait_for] Document replaced while waiting ({e}), retrying")
+                    await asyncio.sleep(READY_POLL_START)
+                    await self._wait_for_page_ready(page, timeout=max(deadline - loop.time(), 0))
+                    continue
+                if found:
                     return f"Text '{text}' found on page."
-                await asyncio.sleep(0.5)
+                break
             
             return f"Timeout: text '{text}' not found after {timeout}ms."
         except Exception as e:
             return f"Error waiting: {str(e)}"
 
-    async def wait_for_navigation(self, timeout: int = 10000) -> str:
-        """Waits for the page URL to change."""
+    async def wait_for_navigation(self, timeout: int = 10000) -> NavResult:
+        """
+        Waits for the top frame to navigate (full load or SPA route change).
+        Listens for the CDP navigation events, so it returns as soon as the
+        navigation happens instead of polling the URL — reloads to the same
+        URL are detected too.
+        """
         try:
             page = self._get_page()
-            current_url = await page.evaluate("window.location.href")
-            start = time.time()
-            timeout_secs = timeout / 1000.0
-            
-            while time.time() - start < timeout_secs:
-                new_url = await page.evaluate("window.location.href")
-                if new_url != current_url:
-                    return f"Navigation detected: {new_url}"
-                await asyncio.sleep(0.5)
-            
-            return f"No navigation detected after {timeout}ms."
+            prev_url, title = await self._url_title(page)
+            navigated = asyncio.Event()
+
+            def on_navigated(event):
+                frame_id = getattr(event, 'frame_id', None) or event.frame.id_
+                if frame_id == page.target.target_id:
+                    navigated.set()
+
+            events = (uc.cdp.page.FrameNavigated, uc.cdp.page.NavigatedWithinDocument)
+            for event_type in events:
+                page.add_handler(event_type, on_navigated)
+            try:
+                await asyncio.wait_for(navigated.wait(), timeout / 1000.0)
+            except asyncio.TimeoutError:
+                return NavResult(False, prev_url, title, prev_url, timeout)
+            finally:
+                for event_type in events:
+                    page.remove_handler(event_type, on_navigated)
+
+            await self._wait_for_page_ready(page, timeout=5)
+            url, title = await self._url_title(page, fresh=True)
+            return NavResult(True, url, title, prev_url)
         except Exception as e:
-            return f"Error waiting for navigation: {str(e)}"
+            return NavResult(timeout=timeout, error=f"Error waiting for navigation: {str(e)}")
 
     # ═══════════════════════════════════════════════════════════════════════
     # JAVASCRIPT EXECUTION
@@ -1218,14 +2049,17 @@ class BrowserAutomation:
     # ═══════════════════════════════════════════════════════════════════════
 
     async def handle_dialog(self, action: str = "accept", prompt_text: str = None) -> str:
-        """Handles browser alert/confirm/prompt dialogs."""
+        """
+        Sets how the NEXT alert/confirm/prompt dialog is answered (see
+        _answer_dialog); later dialogs go back to the default.
+        """
         try:
-            page = self._get_page()
-            if action == "accept":
-                await page.evaluate("window.__edith_dialog_action = 'accept'")
-            else:
-                await page.evaluate("window.__edith_dialog_action = 'dismiss'")
-            return f"Dialog {action}ed."
+            self._get_page()
+            if action not in ("accept", "dismiss"):
+                return f"Error handling dialog: unknown action '{action}' (use 'accept' or 'dismiss')."
+            self._dialog_policy = {"action": action, "prompt": prompt_text}
+            last = f" Last dialog: '{self._dialog_message}'." if self._dialog_message else ""
+            return f"The next dialog will be {action}ed — now repeat the action that opens it.{last}"
         except Exception as e:
             return f"Error handling dialog: {str(e)}"
 
@@ -1236,78 +2070,147 @@ class BrowserAutomation:
     async def switch_to_frame(self, uid: str) -> str:
         """Switches into an iframe by uid."""
         try:
-            # For nodriver, we can inject into iframe context via JS
+            # Same-origin iframes: later actions query el.contentDocument (see _root_js)
             page = self._get_page()
             result = await page.evaluate(f"""
                 (() => {{
-                    const el = document.querySelector('[data-uid="{uid}"]');
+                    const el = {_uid_query(uid)};
                     if (!el || el.tagName.toLowerCase() !== 'iframe') return 'Not an iframe: {uid}';
-                    window.__edith_iframe = el;
+                    if (!el.contentDocument) return 'Cross-origin iframe cannot be entered: {uid}';
                     return 'switched';
                 }})()
             """)
-            return f"Switched to iframe [{uid}]." if result == 'switched' else result
+            if result != 'switched':
+                return result
+            self._frame_uid = uid
+            return f"Switched to iframe [{uid}]."
         except Exception as e:
             return f"Error switching to frame: {str(e)}"
 
     async def switch_to_main(self) -> str:
         """Switches back to the main page from an iframe."""
+        self._frame_uid = None
         return "Switched back to main page."
 
     # ═══════════════════════════════════════════════════════════════════════
     # PAGE INFO & FORM SUBMIT
     # ═══════════════════════════════════════════════════════════════════════
 
-    async def get_page_info(self) -> str:
+    async def get_page_info(self) -> PageInfo:
         """Gets current page URL, title, tab count, and scroll position."""
         try:
-            page = self._get_page()
-            info = await page.evaluate("""
-                (() => ({
-                    url: window.location.href,
-                    title: document.title,
-                    scrollY: window.scrollY,
-                    scrollHeight: document.body.scrollHeight,
-                    viewportHeight: window.innerHeight
-                }))()
-            """)
-            return (
-                f"URL: {info['url']}\n"
-                f"Title: {info['title']}\n"
-                f"Tabs: {len(self.pages)}\n"
-                f"Scroll: {info['scrollY']}/{info['scrollHeight']} (viewport: {info['viewportHeight']}px)"
+            info = await self._page_state()
+            return PageInfo(
+                url=info['url'],
+                title=info['title'],
+                tabs=len(self.pages),
+                scroll_y=info['scrollY'],
+                scroll_height=info['scrollHeight'],
+                viewport_height=info['viewportHeight'],
             )
         except Exception as e:
-            return f"Error getting page info: {str(e)}"
+            return PageInfo(error=f"Error getting page info: {str(e)}")
 
-    async def submit_form(self) -> str:
-        """Auto-finds and clicks a submit button."""
+    async def submit_form(self, nav_timeout: float = 10.0) -> str:
+        """
+        Auto-finds and clicks a submit button.
+        Watches the CDP load events while submitting: if the top frame started
+        loading (a POST/redirect form) but the slow server hasn't answered by
+        the time the page settles, waits up to `nav_timeout` seconds for the
+        new document instead of snapshotting the old one.
+        """
         try:
             page = self._get_page()
-            result = await page.evaluate("""
-                (() => {
-                    const submits = document.querySelectorAll(
-                        'button[type="submit"], input[type="submit"], button:not([type])'
-                    );
-                    for (const btn of submits) {
-                        if (btn.offsetParent !== null) {
-                            btn.click();
-                            return 'submitted: ' + (btn.textContent?.trim() || btn.value || 'button');
-                        }
-                    }
-                    // Try forms
-                    const form = document.querySelector('form');
-                    if (form) { form.submit(); return 'form submitted'; }
-                    return 'No submit button found.';
-                })()
-            """)
-            
-            await asyncio.sleep(1.5)
+            loading = asyncio.Event()
+            navigated = asyncio.Event()
+
+            def on_loading(event):
+                if event.frame_id == page.target.target_id:
+                    loading.set()
+
+            def on_navigated(event):
+                if event.frame.id_ == page.target.target_id:
+                    navigated.set()
+
+            page.add_handler(uc.cdp.page.FrameStartedLoading, on_loading)
+            page.add_handler(uc.cdp.page.FrameNavigated, on_navigated)
+            try:
+                result = await page.evaluate(SUBMIT_FORM_JS.format(root=self._root_js()))
+
+                # Returns once the result page (or the in-page confirmation) has settled
+                await self._wait_for_settle(page, quiet_ms=300, timeout_ms=3000)
+                if loading.is_set() and not navigated.is_set():
+                    try:
+                        await asyncio.wait_for(navigated.wait(), nav_timeout)
+                        await self._wait_for_page_ready(page, timeout=5)
+                        await self._wait_for_settle(page, quiet_ms=300, timeout_ms=2000)
+                    except asyncio.TimeoutError:
+                        logger.debug("[Browser] Form submit still loading, snapshotting anyway")
+            finally:
+                page.remove_handler(uc.cdp.page.FrameStartedLoading, on_loading)
+                page.remove_handler(uc.cdp.page.FrameNavigated, on_navigated)
+
             snapshot = await self.take_snapshot()
-            return f"{result}\n{snapshot}"
+            return f"{result}{self._dialog_note()}\n{snapshot}"
         except Exception as e:
             return f"Error submitting form: {str(e)}"
 
+    # ═══════════════════════════════════════════════════════════════════════
+    # BATCHED ACTIONS
+    # ═══════════════════════════════════════════════════════════════════════
+
+    async def chain(self, actions: list) -> str:
+        """
+        Runs a sequence of actions in one tool call and takes a single
+        snapshot at the end, instead of one agent round-trip per step.
+        Each action is {"type": click|fill|type|hover|select|press|wait,
+        "uid": ..., "value": ...}. Stops at the first failing (or malformed)
+        step; the results of the steps before it are still returned.
+        """
+        try:
+            self._get_page()
+            if not isinstance(actions, list):
+                return "Error running action chain: 'actions' must be a list of steps."
+            results = []
+            for i, action in enumerate(actions, 1):
+                if not isinstance(action, dict):
+                    results.append(f"{i}. Error: step must be an object like "
+                                   '{"type": "click", "uid": "..."}' f", got {action!r:.60}")
+                    results.append(f"Stopped at step {i} of {len(actions)}.")
+                    break
+                kind = action.get("type")
+                uid = action.get("uid")
+                value = action.get("value")
+                value = "" if value is None else str(value)
+                if kind == "click":
+                    r = await self.click(uid, snapshot=False)
+                elif kind in ("fill", "select"):
+                    r = await self.fill(uid, value)
+                elif kind == "type":
+                    r = await self.type_text(value, uid)
+                elif kind == "hover":
+                    r = await self.hover(uid, snapshot=False)
+                elif kind == "press":
+                    r = await self.press_key(value)
+                elif kind == "wait":
+                    if value:
+                        r = await self.wait_for(value)
+                    else:
+                        # No text to wait for — wait until the page stops changing
+                        await self._wait_for_settle(self._get_page(), quiet_ms=300, timeout_ms=3000)
+                        r = "Waited for the page to settle."
+                else:
+                    r = f"Error: unknown action type '{kind}'"
+                results.append(f"{i}. {r}")
+                if r.startswith(("Error", "Element not found", "Timeout")):
+                    results.append(f"Stopped at step {i} of {len(actions)}.")
+                    break
+
+            snapshot = await self.take_snapshot()
+            return "\n".join(results) + f"\n{snapshot}"
+        except Exception as e:
+            return f"Error running action chain: {str(e)}"
+
 
 # Singleton instance
 browser_automation = BrowserAutomation()
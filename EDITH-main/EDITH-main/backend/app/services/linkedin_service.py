@@ -234,7 +234,7 @@ class LinkedInService:
             setting = db.query(SystemSetting).filter(SystemSetting.key == key).first()
             db.close()
             return setting.value if setting else None
-        except:
+        except Exception:
             return None
 
     def _save_setting(self, key: str, value: str):
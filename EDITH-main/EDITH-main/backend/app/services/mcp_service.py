@@ -1,34 +1,186 @@
 import os
 import re
 import httpx
-import json
 from typing import List, Dict, Any
-import pandas as pd
-import pypdf
-from io import BytesIO, StringIO
-import re as stdlib_re
+from io import StringIO
 import smtplib
 from email.message import EmailMessage
 import imaplib
 import email
 import asyncio
 import mimetypes
+import traceback
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
 
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Preformatted, Image
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER
-from docx import Document
-from pptx import Presentation
-from openpyxl import Workbook
 from app.db.database import SessionLocal
-from app.db.models import SystemSetting
 from app.db import models
-from app.services.browser_automation import browser_automation
+from app.services.browser_automation import browser_automation, agent_files_dir, SCREENSHOT_JPEG_QUALITY
+
+
+class PlaywrightLoop:
+    """
+    Runs async Playwright on one dedicated background thread with its own
+    event loop. Callers submit coroutines with run() — no thread pool, and
+    the FastAPI loop never blocks on the Playwright driver.
+
+    One Node driver and one Chromium are shared by every tool call. Calls
+    borrow a BrowserContext from a small pool (acquire_context /
+    release_context) instead of creating and tearing one down each time;
+    `async with playwright_loop.page() as page` wraps both. Each concurrent
+    call gets its own context, so up to CONTEXT_POOL_SIZE calls run in
+    parallel without creating one. A returned context is wiped (see
+    release_context) and retired after CONTEXT_MAX_USES calls, so one call's
+    site state doesn't leak into the next.
+    """
+
+    CONTEXT_POOL_SIZE = 4
+    CONTEXT_MAX_USES = 20
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._contexts = deque()
+        self._context_uses = {}   # context -> calls served so far
+        self._context_origins = {}  # context -> http(s) origins its pages visited
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="playwright-loop", daemon=True
+                ).start()
+        return self._loop
+
+    async def run(self, coro, timeout: float):
+        """
+        Schedules `coro` on the Playwright loop and awaits its result.
+        Raises asyncio.TimeoutError (and cancels the coroutine) after
+        `timeout` seconds so a hung page can't stall the caller forever.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+
+    async def browser(self):
+        """Shared Chromium, started on first use. Must be awaited on the Playwright loop."""
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+        async with self._browser_lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    from playwright.async_api import async_playwright
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=False)
+        return self._browser
+
+    async def acquire_context(self):
+        """Pops a pooled context (or creates one) on the shared browser."""
+        browser = await self.browser()
+        while self._contexts:
+            context = self._contexts.pop()
+            # Contexts from a browser that has since been relaunched are dead
+            if context.browser is browser:
+                return context
+            self._context_uses.pop(context, None)
+        return await browser.new_context()
+
+    async def _wipe_context(self, context, origins: set):
+        """
+        Clears what a site can leave in a context: cookies, granted permissions,
+        the HTTP cache and, for each visited origin, local/session storage,
+        IndexedDB, Cache Storage and service workers. Needs one open page
+        for the CDP session, so it runs before the pages are closed.
+        """
+        await context.clear_cookies()
+        await context.clear_permissions()
+        origins = {o for o in origins if o}  # about:blank, data: etc. leave nothing to clear
+        if not origins or not context.pages:
+            return
+        cdp = await context.new_cdp_session(context.pages[0])
+        try:
+            await cdp.send("Network.clearBrowserCache")
+            for origin in origins:
+                await cdp.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        finally:
+            await cdp.detach()
+
+    async def release_context(self, context):
+        """
+        Returns a context to the pool after wiping it (_wipe_context) and
+        closing its pages. Closes it instead when the pool is full, it has
+        served CONTEXT_MAX_USES calls, or the wipe failed.
+        """
+        origins = self._context_origins.pop(context, set())
+        uses = self._context_uses.pop(context, 0) + 1
+        try:
+            reuse = (uses < self.CONTEXT_MAX_USES and len(self._contexts) < self.CONTEXT_POOL_SIZE
+                     and context.browser.is_connected())
+            if reuse:
+                try:
+                    await self._wipe_context(context, origins)
+                except Exception as e:
+                    print(f"Context wipe error, closing it: {e}")
+                    reuse = False
+            if reuse:
+                for page in context.pages:
+                    await page.close()
+                self._context_uses[context] = uses
+                self._contexts.append(context)
+                return
+            await context.close()
+        except Exception as e:
+            print(f"Context release error: {e}")
+
+    @asynccontextmanager
+    async def page(self):
+        """Yields a new page on a pooled context; the context goes back to the pool afterwards."""
+        context = await self.acquire_context()
+        try:
+            page = await context.new_page()
+            # Remember where the call went, so release_context can wipe those origins
+            origins = self._context_origins.setdefault(context, set())
+            page.on("framenavigated", lambda frame: origins.add(_url_origin(frame.url)))
+            yield page
+        finally:
+            await self.release_context(context)
+
+    async def _shutdown(self):
+        self._contexts.clear()
+        self._context_uses.clear()
+        self._context_origins.clear()
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+
+    def stop(self):
+        """Closes the shared browser and driver. Called once on app shutdown."""
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=10)
+        except Exception as e:
+            print(f"Playwright shutdown error: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+
+def _url_origin(url: str):
+    """scheme://host[:port] of an http(s) URL, else None."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.scheme in ("http", "https") else None
+
+
+playwright_loop = PlaywrightLoop()
+
 
 class MCPService:
 
@@ -288,10 +440,12 @@ class MCPService:
             },
             {
                 "name": "take_snapshot",
-                "description": "Takes a snapshot of the current page. Returns all interactive elements with unique IDs (uid). ALWAYS call this before interacting with elements. Use the uid values with click, fill, hover, etc.",
+                "description": "Takes a snapshot of the current page. Returns the interactive elements with unique IDs (uid), up to 150 per call. ALWAYS call this before interacting with elements. Use the uid values with click, fill, hover, etc.",
                 "parameters": {
                     "type": "object",
-                    "properties": {},
+                    "properties": {
+                        "offset": {"type": "integer", "description": "Skip this many elements — use the offset given at the end of a truncated snapshot to see the next batch. Default 0."}
+                    },
                     "required": []
                 }
             },
@@ -351,6 +505,32 @@ class MCPService:
                     "required": ["elements"]
                 }
             },
+            {
+                "name": "chain",
+                "description": "Runs several browser actions in sequence in one call, then returns one snapshot. Use for multi-step form fills. Stops at the first failing step.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "actions": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "type": {
+                                        "type": "string",
+                                        "enum": ["click", "fill", "type", "hover", "select", "press", "wait"]
+                                    },
+                                    "uid": {"type": "string"},
+                                    "value": {"type": "string"}
+                                },
+                                "required": ["type"]
+                            },
+                            "description": "Steps to run in order. 'value' is the text for fill/type/select, the key for press, and the text to wait for with wait (omit it to wait until the page settles)."
+                        }
+                    },
+                    "required": ["actions"]
+                }
+            },
             {
                 "name": "select_option",
                 "description": "Selects an option from a dropdown by uid and option text.",
@@ -420,6 +600,21 @@ class MCPService:
                     "required": ["url"]
                 }
             },
+            {
+                "name": "open_tabs",
+                "description": "Opens several URLs in new tabs at once (loaded in parallel). The last tab becomes active.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "urls": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "URLs to open, one tab each."
+                        }
+                    },
+                    "required": ["urls"]
+                }
+            },
             {
                 "name": "list_pages",
                 "description": "Lists all open pages/tabs with their indices.",
@@ -467,7 +662,8 @@ class MCPService:
                     "type": "object",
                     "properties": {
                         "uid": {"type": "string", "description": "Optional uid of element to screenshot. If omitted, screenshots the full page."},
-                        "full_page": {"type": "boolean", "description": "If true, captures the entire scrollable page. Default: false."}
+                        "full_page": {"type": "boolean", "description": "If true, captures the entire scrollable page. Default: false."},
+                        "lossless": {"type": "boolean", "description": "If true, saves a lossless PNG instead of a JPEG (e.g. for reading small text). Default: false."}
                     },
                     "required": []
                 }
@@ -499,7 +695,8 @@ class MCPService:
                     "type": "object",
                     "properties": {
                         "text": {"type": "string", "description": "The text to type."},
-                        "uid": {"type": "string", "description": "Optional uid of element to type into. If omitted, types into focused element."}
+                        "uid": {"type": "string", "description": "Optional uid of element to type into. If omitted, types into focused element."},
+                        "human": {"type": "boolean", "description": "Type char-by-char like a human (default true). Set false to fill the value instantly where anti-bot typing isn't needed."}
                     },
                     "required": ["text"]
                 }
@@ -533,7 +730,8 @@ class MCPService:
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "uid": {"type": "string", "description": "The uid of the element to scroll to."}
+                        "uid": {"type": "string", "description": "The uid of the element to scroll to."},
+                        "include_text": {"type": "boolean", "description": "Also return the element's visible text (default false)."}
                     },
                     "required": ["uid"]
                 }
@@ -574,12 +772,12 @@ class MCPService:
             },
             {
                 "name": "handle_dialog",
-                "description": "Handles browser alert/confirm/prompt dialogs.",
+                "description": "Sets how the NEXT browser dialog is answered. Dialogs are answered as they open: alerts are accepted, confirm/prompt dialogs are dismissed by default, and the action that triggered one reports it. To accept a confirm (or answer a prompt), call this first, then repeat the action.",
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "action": {"type": "string", "description": "'accept' or 'dismiss'. Default: 'accept'."},
-                        "prompt_text": {"type": "string", "description": "Text for prompt dialogs (optional)."}
+                        "prompt_text": {"type": "string", "description": "Text to answer a prompt dialog with when accepting (optional)."}
                     },
                     "required": []
                 }
@@ -705,7 +903,7 @@ class MCPService:
             elif name == "open_browser":
                 return await browser_automation.open_browser(arguments.get("url"))
             elif name == "take_snapshot":
-                return await browser_automation.take_snapshot()
+                return await browser_automation.take_snapshot(offset=arguments.get("offset", 0))
             elif name == "click":
                 return await browser_automation.click(arguments.get("uid"), arguments.get("dbl_click", False))
             elif name == "hover":
@@ -714,6 +912,8 @@ class MCPService:
                 return await browser_automation.fill(arguments.get("uid"), arguments.get("value"))
             elif name == "fill_form":
                 return await browser_automation.fill_form(arguments.get("elements", []))
+            elif name == "chain":
+                return await browser_automation.chain(arguments.get("actions", []))
             elif name == "select_option":
                 return await browser_automation.select_option(arguments.get("uid"), arguments.get("option_text"))
             elif name == "drag":
@@ -726,6 +926,8 @@ class MCPService:
                 return await browser_automation.navigate_history(arguments.get("direction"))
             elif name == "new_page":
                 return await browser_automation.new_page(arguments.get("url"))
+            elif name == "open_tabs":
+                return await browser_automation.open_tabs(arguments.get("urls", []))
             elif name == "list_pages":
                 return await browser_automation.list_pages()
             elif name == "select_page":
@@ -735,23 +937,25 @@ class MCPService:
             elif name == "close_browser":
                 return await browser_automation.close_browser()
             elif name == "take_screenshot":
-                return await browser_automation.take_screenshot(arguments.get("uid"), arguments.get("full_page", False))
+                return await browser_automation.take_screenshot(
+                    arguments.get("uid"), arguments.get("full_page", False), arguments.get("lossless", False)
+                )
             elif name == "extract_text":
                 return await browser_automation.extract_text()
             elif name == "extract_structured_data":
                 return await browser_automation.extract_structured_data(arguments.get("data_type", "auto"))
             elif name == "type_text":
-                return await browser_automation.type_text(arguments.get("text"), arguments.get("uid"))
+                return await browser_automation.type_text(arguments.get("text"), arguments.get("uid"), arguments.get("human", True))
             elif name == "press_key":
                 return await browser_automation.press_key(arguments.get("key"), arguments.get("modifiers"))
             elif name == "scroll_page":
                 return await browser_automation.scroll_page(arguments.get("direction", "down"))
             elif name == "scroll_to_element":
-                return await browser_automation.scroll_to_element(arguments.get("uid"))
+                return str(await browser_automation.scroll_to_element(arguments.get("uid"), arguments.get("include_text", False)))
             elif name == "wait_for":
                 return await browser_automation.wait_for(arguments.get("text"), arguments.get("timeout", 5000))
             elif name == "wait_for_navigation":
-                return await browser_automation.wait_for_navigation(arguments.get("timeout", 10000))
+                return str(await browser_automation.wait_for_navigation(arguments.get("timeout", 10000)))
             elif name == "execute_javascript":
                 return await browser_automation.execute_javascript(arguments.get("code"))
             elif name == "handle_dialog":
@@ -761,7 +965,7 @@ class MCPService:
             elif name == "switch_to_main":
                 return await browser_automation.switch_to_main()
             elif name == "get_page_info":
-                return await browser_automation.get_page_info()
+                return str(await browser_automation.get_page_info())
             elif name == "submit_form":
                 return await browser_automation.submit_form()
             # Legacy tool name compatibility
@@ -884,7 +1088,7 @@ Would you like me to send this email? You can:
             
             # Attach files
             for filename in draft.get("attachments", []):
-                path = os.path.join(os.getcwd(), "agent_files", filename)
+                path = os.path.join(agent_files_dir(), filename)
                 if os.path.exists(path):
                     ctype, encoding = mimetypes.guess_type(path)
                     if ctype is None or encoding is not None:
@@ -1045,82 +1249,77 @@ Would you like me to send this email? You can:
         
         return f"System Info: Performing real-time intelligence gathering for '{query}'. No live results found (check API keys in .env). Please provide a valid TAVILY_API_KEY or SERPER_API_KEY to fetch real-world data."
 
-    def _sync_browse_url(self, url: str) -> str:
-        """Sync implementation of browse_url - runs in thread pool."""
+    async def _pw_browse_url(self, url: str) -> str:
+        """Playwright implementation of browse_url - runs on the Playwright loop."""
         try:
-            from playwright.sync_api import sync_playwright
-            
-            with sync_playwright() as p:
-                # Launch Visible Browser
-                browser = p.chromium.launch(headless=False)
+            # Visible shared browser — context borrowed from the pool
+            async with playwright_loop.page() as page:
                 # Maximize or set reasonable size
-                context = browser.new_context(viewport={"width": 1280, "height": 800})
-                page = context.new_page()
+                await page.set_viewport_size({"width": 1280, "height": 800})
                 
                 print(f"Browsing: {url}")
                 # Increased timeout and use domcontentloaded for faster response
-                page.goto(url, timeout=90000, wait_until='domcontentloaded')
+                await page.goto(url, timeout=90000, wait_until='domcontentloaded')
                 
                 # Wait for some content (simulates reading)
-                page.wait_for_timeout(3000) 
-                
-                # Extract text
-                text = page.evaluate("document.body.innerText")
-                title = page.title()
+                await asyncio.sleep(3)
                 
-                browser.close()
-                
-                # Basic cleaning & strict truncation
-                cleaned = re.sub(r'\s+', ' ', text).strip()
-                return f"Browsed: {title} | {url}\n{cleaned[:2000]}"
+                # Extract title + text in one round-trip. Whitespace cleaning and
+                # strict truncation run in the page, so only 2000 chars cross the wire
+                title, cleaned = await page.evaluate(
+                    "() => [document.title, (document.body?.innerText || '').replace(/\\s+/g, ' ').trim().slice(0, 2000)]"
+                )
+            
+            return f"Browsed: {title} | {url}\n{cleaned}"
         except Exception as e:
-            import traceback
             error_details = traceback.format_exc()
             print(f"Browse Error: {error_details}")
             return f"Playwright Browse Error: {str(e)}"
     
     async def _browse_url(self, url: str) -> str:
         """Browse URL using Playwright (Visible Mode) for handling dynamic content."""
-        import concurrent.futures
-        loop = asyncio.get_event_loop()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            return await loop.run_in_executor(executor, self._sync_browse_url, url)
+        try:
+            # 90s goto + 3s read + margin
+            return await playwright_loop.run(self._pw_browse_url(url), timeout=100)
+        except asyncio.TimeoutError:
+            return f"Playwright Browse Error: timed out after 100s loading {url}"
 
-    def _sync_take_screenshot(self, url: str, filename: str) -> str:
-        """Sync implementation of take_screenshot - runs in thread pool."""
+    async def _pw_take_screenshot(self, url: str, filename: str) -> str:
+        """Playwright implementation of take_screenshot - runs on the Playwright loop."""
         try:
-            from playwright.sync_api import sync_playwright
-            
-            path = os.path.join(os.getcwd(), "agent_files", filename)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
+            path = os.path.join(agent_files_dir(), filename)
+            if os.path.dirname(filename):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
             
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=False)
-                page = browser.new_page()
-                page.goto(url, timeout=90000, wait_until='domcontentloaded')
-                page.wait_for_timeout(2000)
+            async with playwright_loop.page() as page:
+                await page.goto(url, timeout=90000, wait_until='domcontentloaded')
+                await asyncio.sleep(2)
                 
-                page.screenshot(path=path)
-                browser.close()
+                # Playwright picks the format from the extension; JPEGs get the shared quality
+                if path.lower().endswith(('.jpg', '.jpeg')):
+                    await page.screenshot(path=path, quality=SCREENSHOT_JPEG_QUALITY)
+                else:
+                    await page.screenshot(path=path)
                 
             return f"Screenshot saved to '{filename}'."
         except Exception as e:
-            import traceback
             error_details = traceback.format_exc()
             print(f"Screenshot Error: {error_details}")
             return f"Screenshot Error: {str(e)}"
     
     async def _take_screenshot(self, url: str, filename: str) -> str:
         """Takes a screenshot of the given URL."""
-        import concurrent.futures
-        loop = asyncio.get_event_loop()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            return await loop.run_in_executor(executor, self._sync_take_screenshot, url, filename)
+        try:
+            # 90s goto + 2s settle + margin
+            return await playwright_loop.run(self._pw_take_screenshot(url, filename), timeout=100)
+        except asyncio.TimeoutError:
+            return f"Screenshot Error: timed out after 100s loading {url}"
 
     def _write_file(self, filename: str, content: str) -> str:
         # Save to agent_files
-        path = os.path.join(os.getcwd(), "agent_files", filename)
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+        path = os.path.join(agent_files_dir(), filename)
+        if os.path.dirname(filename):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, "w") as f:
             f.write(content)
         return f"File '{filename}' written successfully."
@@ -1130,11 +1329,12 @@ Would you like me to send this email? You can:
     def _analyze_data(self, filename: str, query: str) -> str:
         """Reads CSV/Excel and returns a summary or analysis."""
         try:
+            import pandas as pd
             # DEBUG
             print(f"DEBUG: Analyze requested for '{filename}'")
             print(f"DEBUG: CWD is {os.getcwd()}")
             
-            path = os.path.join(os.getcwd(), "agent_files", filename)
+            path = os.path.join(agent_files_dir(), filename)
             print(f"DEBUG: Full path check: {path}")
             
             if not os.path.exists(path):
@@ -1170,7 +1370,8 @@ Would you like me to send this email? You can:
     def _read_pdf(self, filename: str) -> str:
         """Extracts text from a PDF file."""
         try:
-            path = os.path.join(os.getcwd(), "agent_files", filename)
+            import pypdf
+            path = os.path.join(agent_files_dir(), filename)
             if not os.path.exists(path):
                 return f"Error: File '{filename}' not found."
             
@@ -1190,8 +1391,14 @@ Would you like me to send this email? You can:
     def _create_pdf(self, filename: str, content: str) -> str:
         """Creates a PDF file with Markdown formatting support."""
         try:
-            path = os.path.join(os.getcwd(), "agent_files", filename)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
+            from reportlab.lib.pagesizes import letter
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Preformatted
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.enums import TA_CENTER
+            path = os.path.join(agent_files_dir(), filename)
+            if os.path.dirname(filename):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
             
             doc = SimpleDocTemplate(path, pagesize=letter)
             styles = getSampleStyleSheet()
@@ -1361,8 +1568,10 @@ Would you like me to send this email? You can:
     def _create_docx(self, filename: str, content: str) -> str:
         """Creates a Word document with Markdown formatting support."""
         try:
-            path = os.path.join(os.getcwd(), "agent_files", filename)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
+            from docx import Document
+            path = os.path.join(agent_files_dir(), filename)
+            if os.path.dirname(filename):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
             
             doc = Document()
             
@@ -1439,8 +1648,10 @@ Would you like me to send this email? You can:
     def _create_ppt(self, filename: str, title: str, slides: List[Dict[str, Any]]) -> str:
         """Creates a PowerPoint presentation."""
         try:
-            path = os.path.join(os.getcwd(), "agent_files", filename)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
+            from pptx import Presentation
+            path = os.path.join(agent_files_dir(), filename)
+            if os.path.dirname(filename):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
             
             prs = Presentation()
             
@@ -1478,8 +1689,10 @@ Would you like me to send this email? You can:
     def _create_excel(self, filename: str, data: List[Dict[str, Any]]) -> str:
         """Creates an Excel spreadsheet with styled headers."""
         try:
-            path = os.path.join(os.getcwd(), "agent_files", filename)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
+            import pandas as pd
+            path = os.path.join(agent_files_dir(), filename)
+            if os.path.dirname(filename):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
             
             if not data:
                 return "Error: No data provided for Excel file."
@@ -1555,7 +1768,7 @@ After authorization, try posting again."""
                     if os.path.isabs(filename) and os.path.exists(filename):
                         image_path = filename
                     else:
-                        image_path = os.path.join(os.getcwd(), "agent_files", filename)
+                        image_path = os.path.join(agent_files_dir(), filename)
                         
                     if not os.path.exists(image_path):
                         return f"Error: Image '{filename}' not found (checked absolute path and agent_files)."
@@ -1587,20 +1800,20 @@ After authorization, try posting again."""
             r'^([a-zA-Z0-9_-]{11})$',  # Just the ID
         ]
         for pattern in patterns:
-            match = stdlib_re.search(pattern, url)
+            match = re.search(pattern, url)
             if match:
                 return match.group(1)
         return None
 
     def _fetch_transcript(self, video_id: str):
         """Fetches transcript using v1.2.4 API. Returns list of FetchedTranscriptSnippet."""
-        from youtube_transcript_api import YouTubeTranscriptApi
+        from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound
         ytt = YouTubeTranscriptApi()
         tlist = ytt.list(video_id)
         # Try manual captions first, then auto-generated
         try:
             t = tlist.find_transcript(['en'])
-        except:
+        except NoTranscriptFound:
             t = tlist.find_generated_transcript(['en'])
         return t.fetch()
 
@@ -1627,7 +1840,7 @@ After authorization, try posting again."""
                     window_texts.append(snippets[j].text)
                 
                 combined = ' '.join(window_texts).lower()
-                combined = stdlib_re.sub(r'\s+', ' ', combined)
+                combined = re.sub(r'\s+', ' ', combined)
                 
                 if search_lower in combined:
                     seconds = int(snippets[i].start)
@@ -1698,18 +1911,20 @@ After authorization, try posting again."""
                 return f"No transcript available: {str(e)}"
 
             # Format with timestamps, respecting max_chars
-            output = ""
+            lines = []
+            length = 0
             for s in snippets:
                 seconds = int(s.start)
                 timestamp = f"{seconds // 60}:{seconds % 60:02d}"
                 line = f"[{timestamp}] {s.text}\n"
                 
-                if len(output) + len(line) > max_chars:
-                    output += f"\n... (truncated at {max_chars} chars. Use youtube_transcript_search for specific phrases)"
+                if length + len(line) > max_chars:
+                    lines.append(f"\n... (truncated at {max_chars} chars. Use youtube_transcript_search for specific phrases)")
                     break
-                output += line
+                lines.append(line)
+                length += len(line)
 
-            return output
+            return "".join(lines)
 
         except Exception as e:
             return f"YouTube transcript error: {str(e)}"
@@ -17,9 +17,12 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.api.v1.endpoints import auth, chat, logs, files, settings, sessions, scheduler, linkedin
 from app.db import models
 from app.db.database import engine
+from app.services.browser_automation import shutdown_browser
+from app.services.mcp_service import playwright_loop
 
 # Create DB tables on startup
 models.Base.metadata.create_all(bind=engine)
@@ -39,6 +42,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compress larger responses (tool output, snapshots, screenshots)
+app.add_middleware(GZipMiddleware, minimum_size=500)
 
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Auth"])
 app.include_router(chat.router, prefix="/api/v1/chat", tags=["Chat"])
@@ -49,6 +54,11 @@ app.include_router(sessions.router, prefix="/api/v1/sessions", tags=["Sessions"]
 app.include_router(scheduler.router, prefix="/api/v1/scheduler", tags=["Scheduler"])
 app.include_router(linkedin.router, prefix="/api/v1/linkedin", tags=["LinkedIn"])
 
+@app.on_event("shutdown")
+def stop_shared_browser():
+    shutdown_browser()
+    playwright_loop.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to EDITH"}